@@ -6,13 +6,16 @@ Konfigurationsfil för Remissorterare
 SANNOLIKHET_TRÖSKEL = 70  # Minsta sannolikhet för att sortera till verksamhet
 
 # OCR-inställningar
-OCR_DPI = 300
+OCR_DPI = 300  # Upplösning för sidor med låg OCR-konfidens
+OCR_DPI_SNABB = 150  # Upplösning för första OCR-försöket (räcker för de flesta laserutskrivna remisser)
+OCR_MIN_KONFIDENS = 80  # Medelkonfidens (0-100) under vilken sidan renderas om med OCR_DPI
 OCR_SPRÅK = 'swe+eng'
 OCR_PSM = '--psm 6'
 
 # Verksamheter och nyckelord (laddas från JSON-fil)
 import json
 import os
+from types import MappingProxyType as _MappingProxyType  # Understreck så att namnet inte följer med i "from config import *"
 
 def ladda_verksamheter():
     """Ladda verksamheter från JSON-fil"""
@@ -41,6 +44,29 @@ def ladda_verksamheter():
 
 VERKSAMHETER = ladda_verksamheter()
 
+# Fraser som inleder mottagare/remissadress (INTE avsändare), i sökordning
+MOTTAGARFRASER = (
+    "remiss till", "remitteras till", "mottagare:", "mottagande verksamhet:", 
+    "mottagande avdelning:", "remissadress:", "till:", "för:", "till verksamhet:",
+    "till avdelning:", "till klinik:", "till mottagare:", "till specialist:",
+    "remitteras till", "skickas till", "överlämnas till", "överförs till"
+)
+
+# Specifika mottagarkliniker/avdelningar per verksamhet (skrivskyddad)
+MOTTAGARKLINIKER = _MappingProxyType({
+    "Ortopedi": ("ortopedklinik", "ortopedkliniken", "ortopedavdelning", "ortopedavdelningen"),
+    "Kirurgi": ("kirurgklinik", "kirurgkliniken", "kirurgavdelning", "kirurgavdelningen"),
+    "Kardiologi": ("kardioklinik", "kardiokliniken", "kardioavdelning", "kardioavdelningen"),
+    "Neurologi": ("neurologklinik", "neurologkliniken", "neurologavdelning", "neurologavdelningen"),
+    "Gastroenterologi": ("gastroklinik", "gastrokliniken", "gastroavdelning", "gastroavdelningen"),
+    "Endokrinologi": ("endokrinklinik", "endokrinkliniken", "endokrinavdelning", "endokrinavdelningen"),
+    "Dermatologi": ("dermaklinik", "dermakliniken", "dermaavdelning", "dermaavdelningen"),
+    "Urologi": ("uroklinik", "urokliniken", "uroavdelning", "uroavdelningen"),
+    "Gynekologi": ("gynekoklinik", "gynekokliniken", "gynekoavdelning", "gynekoavdelningen"),
+    "Oftalmologi": ("ögonklinik", "ögonkliniken", "ögonavdelning", "ögonavdelningen"),
+    "Otorinolaryngologi": ("ent-klinik", "ent-kliniken", "ent-avdelning", "ent-avdelningen")
+})
+
 # Mappnamn
 INPUT_MAPP = "input"
 OUTPUT_MAPP = "output"
@@ -56,3 +82,16 @@ AI_MODEL = "gpt-3.5-turbo"
 AI_TEMPERATURE = 0.1
 AI_MAX_TOKENS = 200
 AI_CONFIDENCE_THRESHOLD = 70  # Minsta sannolikhet för att använda AI-resultat
+IDENTIFIERING_CACHE_STORLEK = 1024  # Antal texter vars AI/ML-resultat sparas i minnet
+
+# Webbgränssnitt
+WEB_SESSION_MAX_ANTAL = 10000  # Max antal sessioner vars status/resultat hålls i minnet
+WEB_SESSION_TTL = 3600  # Sekunder innan en sessions status/resultat rensas
+WEB_OCR_PROCESSER = int(os.environ.get('REMISS_WORKERS', max(1, (os.cpu_count() or 1) - 1)))  # Processer för OCR i webbgränssnittet, en kärna lämnas åt webbservern
+WEB_JOBBKÖ_MAX = 1024  # Max antal PDF:er som väntar på bearbetning innan nya uppladdningar avvisas
+WEB_X_SENDFILE = os.environ.get('REMISS_X_SENDFILE') == '1'  # Låt en omvänd proxy (t.ex. nginx/Apache med X-Sendfile) skicka filerna
+REDIS_URL = os.environ.get('REDIS_URL')  # T.ex. redis://localhost:6379/0 för att dela status mellan webbprocesser
+OCR_CACHE_MAPP = "cache/ocr"  # OCR-text per PDF (hash av filinnehållet) för webbgränssnittet
+OCR_CACHE_MAX_STORLEK = 50 * 1024 * 1024  # Max antal byte i OCR-cachen, de minst nyligen använda filerna tas bort först
+OCR_CACHE_TTL = 7 * 24 * 3600  # Sekunder sedan senaste användning innan en OCR-cachefil tas bort
+OCR_TEXT_CACHE_STORLEK = 64  # Antal PDF:ers text som hålls i minnet, nyckel är (sökväg, mtime, storlek)
@@ -7,6 +7,7 @@ Stöder flera AI-modeller: Ollama, BERT, Sentence Transformers, och andra
 import logging
 import json
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Dict, List, Tuple, Optional
 import numpy as np
 from config import VERKSAMHETER
@@ -14,6 +15,11 @@ from ollama_config import *
 
 logger = logging.getLogger(__name__)
 
+# Gemensam HTTP-session mot Ollama och andra lokala AI-servrar. Anslutningarna
+# hålls öppna (keep-alive) och återanvänds i stället för att öppnas per anrop.
+http_session = requests.Session()
+http_session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=10))
+
 class LokalAIVerksamhetsIdentifierare:
     """Modern lokal AI-baserad verksamhetsidentifierare med stöd för flera modelltyper"""
     
@@ -118,7 +124,7 @@ class LokalAIVerksamhetsIdentifierare:
         """Laddar Ollama-modell"""
         try:
             # Testa anslutning till Ollama
-            response = requests.get("http://localhost:11434/api/tags", timeout=5)
+            response = http_session.get("http://localhost:11434/api/tags", timeout=5)
             if response.status_code == 200:
                 # Kontrollera vilken modell som är vald
                 vald_modell = self.model_options["ollama"]["name"]
@@ -126,7 +132,7 @@ class LokalAIVerksamhetsIdentifierare:
                 
                 # Kontrollera om modellen finns installerad
                 try:
-                    model_response = requests.get(f"http://localhost:11434/api/show", 
+                    model_response = http_session.get(f"http://localhost:11434/api/show", 
                                                json={"name": vald_modell}, timeout=5)
                     if model_response.status_code == 200:
                         logger.info(f"Modell {vald_modell} är installerad och redo")
@@ -216,7 +222,7 @@ class LokalAIVerksamhetsIdentifierare:
         """Laddar lokal OpenAI-kompatibel server"""
         try:
             # Testa anslutning till lokal server
-            response = requests.get("http://localhost:1234/v1/models", timeout=5)
+            response = http_session.get("http://localhost:1234/v1/models", timeout=5)
             if response.status_code == 200:
                 logger.info("Lokal OpenAI-server fungerar")
                 self.model = "openai_local"
@@ -299,7 +305,7 @@ class LokalAIVerksamhetsIdentifierare:
         try:
             prompt = self._skapa_ollama_prompt(text)
             
-            response = requests.post(
+            response = http_session.post(
                 "http://localhost:11434/api/generate",
                 json={
                     "model": self.model_options["ollama"]["name"],
@@ -409,7 +415,7 @@ class LokalAIVerksamhetsIdentifierare:
         try:
             prompt = self._skapa_openai_prompt(text)
             
-            response = requests.post(
+            response = http_session.post(
                 "http://localhost:1234/v1/chat/completions",
                 json={
                     "model": "local",
@@ -5,8 +5,11 @@ Använder TF-IDF och klassificerare för förbättrad precision
 """
 
 import pickle
+import hashlib
 import logging
+import threading
 import numpy as np
+from collections import OrderedDict
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 from sklearn.feature_extraction.text import TfidfVectorizer
@@ -17,7 +20,7 @@ from sklearn.metrics import classification_report, accuracy_score
 from sklearn.pipeline import Pipeline
 import joblib
 
-from config import VERKSAMHETER
+from config import VERKSAMHETER, IDENTIFIERING_CACHE_STORLEK
 
 logger = logging.getLogger(__name__)
 
@@ -30,15 +33,21 @@ class MLVerksamhetsIdentifierare:
         self.trained = False
         self.fallback_identifierare = None
         
+        # Resultat per text (blake2b-hash) för den aktuella modellen. Versionen räknas upp
+        # när modellen byts, så att resultat från en gammal modell inte sparas efter bytet.
+        self._resultat_cache: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self._modellversion = 0
+        self._cache_lås = threading.Lock()
+        
         # Skapa models-mapp
         self.model_path.parent.mkdir(exist_ok=True)
         
         # Ladda befintlig modell om den finns
         self.ladda_modell()
     
-    def skapa_pipeline(self):
-        """Skapar ML-pipeline med TF-IDF och klassificerare"""
-        self.pipeline = Pipeline([
+    def skapa_pipeline(self) -> Pipeline:
+        """Skapar en ny otränad ML-pipeline med TF-IDF och klassificerare"""
+        return Pipeline([
             ('tfidf', TfidfVectorizer(
                 max_features=2000,
                 ngram_range=(1, 2),
@@ -92,10 +101,28 @@ class MLVerksamhetsIdentifierare:
         Args:
             custom_data: Valfri egen träningsdata (texter, verksamheter)
         """
+        pipeline, accuracy = self.träna_pipeline(custom_data)
+        self.byt_pipeline(pipeline)
+        
+        # Spara modellen
+        self.spara_modell()
+        
+        return accuracy
+    
+    def träna_pipeline(self, custom_data: Optional[Tuple[List[str], List[str]]] = None) -> Tuple[Pipeline, float]:
+        """
+        Tränar en ny pipeline utan att röra den som används för identifiering
+        
+        Args:
+            custom_data: Valfri egen träningsdata (texter, verksamheter)
+            
+        Returns:
+            Tuple med (tränad pipeline, precision på testdatan)
+        """
         logger.info("Startar träning av ML-modell...")
         
         # Skapa pipeline
-        self.skapa_pipeline()
+        pipeline = self.skapa_pipeline()
         
         # Förbereda träningsdata
         if custom_data:
@@ -111,20 +138,16 @@ class MLVerksamhetsIdentifierare:
         )
         
         # Träna modellen
-        self.pipeline.fit(X_train, y_train)
+        pipeline.fit(X_train, y_train)
         
         # Utvärdera modellen
-        y_pred = self.pipeline.predict(X_test)
+        y_pred = pipeline.predict(X_test)
         accuracy = accuracy_score(y_test, y_pred)
         
         logger.info(f"Modellträning slutförd. Precision: {accuracy:.3f}")
         logger.info(f"Klassifikationsrapport:\n{classification_report(y_test, y_pred)}")
         
-        # Spara modellen
-        self.spara_modell()
-        self.trained = True
-        
-        return accuracy
+        return pipeline, accuracy
     
     def träna_med_anpassad_data(self, texter: List[str], verksamheter: List[str]):
         """
@@ -134,27 +157,11 @@ class MLVerksamhetsIdentifierare:
             texter: Lista med texter att träna på
             verksamheter: Motsvarande verksamheter för texterna
         """
-        if not texter or not verksamheter or len(texter) != len(verksamheter):
-            logger.error("Ogiltig träningsdata")
-            return
-        
-        logger.info(f"Tränar modell med {len(texter)} anpassade texter")
-        
         try:
-            # Skapa pipeline om den inte finns
-            if self.pipeline is None:
-                self.skapa_pipeline()
-            
-            # Kombinera befintlig träningsdata med ny data
-            befintliga_texter, befintliga_verksamheter = self.förbereda_träningsdata()
-            
-            # Lägg till den nya datan
-            alla_texter = befintliga_texter + texter
-            alla_verksamheter = befintliga_verksamheter + verksamheter
-            
-            # Träna modellen
-            self.pipeline.fit(alla_texter, alla_verksamheter)
-            self.trained = True
+            pipeline = self.träna_anpassad_pipeline(texter, verksamheter)
+            if pipeline is None:
+                return
+            self.byt_pipeline(pipeline)
             
             # Spara den uppdaterade modellen
             self.spara_modell()
@@ -165,6 +172,48 @@ class MLVerksamhetsIdentifierare:
             logger.error(f"Fel vid träning med anpassad data: {e}")
             raise
     
+    def träna_anpassad_pipeline(self, texter: List[str], verksamheter: List[str]) -> Optional[Pipeline]:
+        """
+        Tränar en ny pipeline på anpassad data utan att röra den som används för identifiering
+        
+        Args:
+            texter: Lista med texter att träna på
+            verksamheter: Motsvarande verksamheter för texterna
+            
+        Returns:
+            Tränad pipeline, eller None om träningsdatan är ogiltig
+        """
+        if not texter or not verksamheter or len(texter) != len(verksamheter):
+            logger.error("Ogiltig träningsdata")
+            return None
+        
+        logger.info(f"Tränar modell med {len(texter)} anpassade texter")
+        
+        # Kombinera befintlig träningsdata med ny data
+        befintliga_texter, befintliga_verksamheter = self.förbereda_träningsdata()
+        
+        # Lägg till den nya datan
+        alla_texter = befintliga_texter + texter
+        alla_verksamheter = befintliga_verksamheter + verksamheter
+        
+        # Träna modellen
+        pipeline = self.skapa_pipeline()
+        pipeline.fit(alla_texter, alla_verksamheter)
+        return pipeline
+    
+    def byt_pipeline(self, pipeline: Pipeline):
+        """
+        Byter in en färdigtränad pipeline och tömmer resultatcachen
+        
+        Args:
+            pipeline: Tränad pipeline
+        """
+        with self._cache_lås:
+            self.pipeline = pipeline
+            self._modellversion += 1
+            self._resultat_cache.clear()
+            self.trained = True
+    
     def identifiera_verksamhet(self, text: str) -> Tuple[str, float]:
         """
         Identifierar verksamhet med ML-modell
@@ -175,29 +224,64 @@ class MLVerksamhetsIdentifierare:
         Returns:
             Tuple med (verksamhet, sannolikhet)
         """
-        if not self.trained or self.pipeline is None:
+        return self.identifiera_verksamhet_batch([text])[0]
+    
+    def identifiera_verksamhet_batch(self, texter: List[str]) -> List[Tuple[str, float]]:
+        """
+        Identifierar verksamhet för flera texter med ett enda modellanrop
+        
+        Args:
+            texter: Texter att analysera
+            
+        Returns:
+            Lista med (verksamhet, sannolikhet) i samma ordning som texterna
+        """
+        if not texter:
+            return []
+        
+        # Pipeline och version läses en gång, så att ett modellbyte under anropet inte blandar modeller
+        with self._cache_lås:
+            pipeline, version = self.pipeline, self._modellversion
+        
+        if not self.trained or pipeline is None:
             logger.warning("ML-modell inte tränad, använder fallback")
-            return self.fallback_identifiering(text)
+            return [self.fallback_identifiering(text) for text in texter]
         
         try:
-            # Förutsäg verksamhet
-            prediction = self.pipeline.predict([text])[0]
+            # Texter som redan klassificerats med samma modell hämtas ur cachen
+            nycklar = [hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest() for text in texter]
+            with self._cache_lås:
+                resultat = [self._resultat_cache.get(nyckel) for nyckel in nycklar]
+                for nyckel, r in zip(nycklar, resultat):
+                    if r is not None:
+                        self._resultat_cache.move_to_end(nyckel)
+            saknade = [i for i, r in enumerate(resultat) if r is None]
             
-            # Hämta sannolikheter för alla klasser
-            probabilities = self.pipeline.predict_proba([text])[0]
-            
-            # Hitta index för förutsagd verksamhet
-            classes = self.pipeline.classes_
-            pred_index = list(classes).index(prediction)
-            sannolikhet = probabilities[pred_index] * 100
+            if saknade:
+                # Hämta sannolikheter för alla klasser; förutsagd klass är den mest sannolika
+                probabilities = pipeline.predict_proba([texter[i] for i in saknade])
+                classes = pipeline.classes_
+                pred_indices = probabilities.argmax(axis=1)
+                
+                for i, rad, pred_index in zip(saknade, probabilities, pred_indices):
+                    resultat[i] = (classes[pred_index], rad[pred_index] * 100)
+                
+                # Resultaten sparas bara om modellen inte bytts under tiden
+                with self._cache_lås:
+                    if self._modellversion == version:
+                        for i in saknade:
+                            self._resultat_cache[nycklar[i]] = resultat[i]
+                        while len(self._resultat_cache) > IDENTIFIERING_CACHE_STORLEK:
+                            self._resultat_cache.popitem(last=False)
             
-            logger.info(f"ML-identifiering: {prediction} (sannolikhet: {sannolikhet:.1f}%)")
+            for prediction, sannolikhet in resultat:
+                logger.info(f"ML-identifiering: {prediction} (sannolikhet: {sannolikhet:.1f}%)")
             
-            return prediction, sannolikhet
+            return resultat
             
         except Exception as e:
             logger.error(f"ML-identifiering misslyckades: {e}")
-            return self.fallback_identifiering(text)
+            return [self.fallback_identifiering(text) for text in texter]
     
     def fallback_identifiering(self, text: str) -> Tuple[str, float]:
         """
@@ -223,8 +307,7 @@ class MLVerksamhetsIdentifierare:
         """Laddar befintlig modell"""
         try:
             if self.model_path.exists():
-                self.pipeline = joblib.load(self.model_path)
-                self.trained = True
+                self.byt_pipeline(joblib.load(self.model_path))
                 logger.info(f"Modell laddad: {self.model_path}")
             else:
                 logger.info("Ingen befintlig modell hittad")
@@ -244,10 +327,7 @@ class MLVerksamhetsIdentifierare:
             logger.error("Modell inte tränad")
             return
         
-        predictions = []
-        for text in test_texter:
-            pred, _ = self.identifiera_verksamhet(text)
-            predictions.append(pred)
+        predictions = [pred for pred, _ in self.identifiera_verksamhet_batch(test_texter)]
         
         accuracy = accuracy_score(true_verksamheter, predictions)
         logger.info(f"Utvärdering: Precision {accuracy:.3f}")
@@ -10,13 +10,25 @@ import os
 import sys
 import re
 import shutil
+import hashlib
+import locale
 import logging
+import logging.handlers
+import queue
+import subprocess
+import tempfile
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Optional, Union
 
 import pytesseract
-from pdf2image import convert_from_path
+from pytesseract import Output
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
 import cv2
 import numpy as np
@@ -27,6 +39,34 @@ from ai_verksamhetsidentifierare import AIVerksamhetsIdentifierare
 from lokal_ai_verksamhetsidentifierare import LokalAIVerksamhetsIdentifierare
 from ai_config import *
 
+# Villkorlig tesserocr-import (Tesseract via C-API utan subprocess per sida)
+try:
+    from tesserocr import PyTessBaseAPI, PSM
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+# Villkorlig PyMuPDF-import (rendering i processen, direkt till gråskala)
+try:
+    import pymupdf
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+# Villkorlig re2-import (linjär matchning utan backtracking)
+try:
+    import re2
+    RE2_AVAILABLE = True
+except ImportError:
+    RE2_AVAILABLE = False
+
+# Villkorlig pyahocorasick-import (alla nyckelord hittas i ett svep över texten)
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 # Kontrollera att virtuell miljö är aktiverad
 def kontrollera_virtuell_miljo():
     """Kontrollerar att virtuell miljö är aktiverad innan programmet startar"""
@@ -77,39 +117,138 @@ def kontrollera_virtuell_miljo():
 kontrollera_virtuell_miljo()
 
 # Konfigurera logging
+# Loggfilen skrivs via en MemoryHandler som samlar 100 poster per skrivning;
+# varningar och fel skrivs ut direkt
+_LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+_fil_handler = logging.FileHandler(LOG_FIL)
+_fil_handler.setFormatter(logging.Formatter(_LOG_FORMAT))
 logging.basicConfig(
     level=getattr(logging, LOG_NIVÅ),
-    format='%(asctime)s - %(levelname)s - %(message)s',
+    format=_LOG_FORMAT,
     handlers=[
-        logging.FileHandler(LOG_FIL),
+        logging.handlers.MemoryHandler(100, flushLevel=logging.WARNING, target=_fil_handler),
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger(__name__)
 
+# Antal parallella pdftoppm-processer vid rendering av flersidiga PDF:er
+_RENDER_TRÅDAR = max(1, (os.cpu_count() or 1) - 1)
+# En renderad sida: numpy-array i gråskala från PyMuPDF eller PIL-bild från pdf2image
+Sidbild = Union[np.ndarray, Image.Image]
+# Antal tesserocr-instanser (och OCR-trådar); varje instans håller en egen språkmodell i minnet
+_OCR_TRÅDAR = min(4, os.cpu_count() or 1)
+# Antal PDF-filer som läses samtidigt i bearbeta_alla_pdf
+_PDF_PROCESSER = max(1, (os.cpu_count() or 1) // 2)
+
+# Output-mappar vars undermappar redan skapats i den här processen
+_SÄKRADE_MAPPAR: set = set()
+
+# Reguljära uttryck kompileras en gång vid import i stället för vid varje anrop
+# Datumformat: YYYY-MM-DD samt DD/MM/YYYY, DD-MM-YYYY och DD.MM.YYYY (även tvåsiffrigt år)
+_DATUM_RE = re.compile(
+    r'\b(?:(?P<ymd>(?P<ymd_år>\d{4})-(?P<ymd_månad>\d{1,2})-(?P<ymd_dag>\d{1,2}))'
+    r'|(?P<dmy>(?P<dmy_dag>\d{1,2})[/.\-](?P<dmy_månad>\d{1,2})[/.\-](?P<dmy_år>\d{2,4})))\b',
+    re.ASCII
+)
+# Matchar t.ex. '19850415-1234', '198504151234', '19 850415-1234', '20 990101-5678'
+_PERSONNUMMER_MÖNSTER = r'((?:19|20)[ ]?\d{6}-?\d{4})'
+_PERSONNUMMER_RE = re2.compile(_PERSONNUMMER_MÖNSTER) if RE2_AVAILABLE else re.compile(_PERSONNUMMER_MÖNSTER, re.ASCII)
+# Siffersumman för 2 * siffran, för Luhn-kontroll av personnummer
+_LUHN_DUBBEL = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+_PSM_RE = re.compile(r'--psm\s+(\d+)')
+
+# Otsus separationsmått (mellanklassvarians / total varians) från vilket
+# en sida räknas som tvåfärgad och binariseras före OCR
+_BIMODAL_GRÄNS = 0.8
+
+# Specifika termer som ger extra poäng i fallback-poängsättningen
+_GYN_TERMER = frozenset({
+    "livmoder", "äggstockar", "menstruation", "menopaus", "endometrios",
+    "myom", "cervix", "ovariell", "mammografi", "bröst", "graviditet",
+    "förlossning", "uterus", "ovarium"
+})
+_KIR_TERMER = frozenset({
+    "operation", "operera", "kirurgisk", "snitt", "laparoskopi",
+    "endoskopi", "biopsi", "appendicit", "gallsten", "hernia",
+    "bråck", "polyp", "cholecystektomi", "appendektomi"
+})
+_SPECIFIKA_TERMER = {"Gynekologi": _GYN_TERMER, "Kirurgi": _KIR_TERMER}
+
+
+@lru_cache(maxsize=1024)
+def _tolka_datum(datumtext: str) -> Optional[str]:
+    """
+    Tolkar en datumträff från _DATUM_RE
+    
+    Samma datumsträngar återkommer i mallar och sidhuvuden, så resultatet cachas.
+    
+    Args:
+        datumtext: Matchad text, t.ex. '2024-01-15' eller '15/01/24'
+        
+    Returns:
+        Datum i YYYY-MM-DD format eller None om datumet är ogiltigt
+    """
+    match = _DATUM_RE.fullmatch(datumtext)
+    if match.group('ymd'):  # YYYY-MM-DD
+        year, month, day = (int(g) for g in match.group('ymd_år', 'ymd_månad', 'ymd_dag'))
+    else:  # DD/MM/YYYY, DD-MM-YYYY eller DD.MM.YYYY
+        day, month = int(match.group('dmy_dag')), int(match.group('dmy_månad'))
+        år_text = match.group('dmy_år')
+        if len(år_text) == 2:  # År med 2 siffror
+            year = int(år_text)
+            if year < 50:
+                year += 2000
+            else:
+                year += 1900
+        else:
+            year = int(år_text)
+    
+    # Validera datum
+    if 1900 <= year <= 2100 and 1 <= month <= 12 and 1 <= day <= 31:
+        return f"{year:04d}-{month:02d}-{day:02d}"
+    return None
+
+
 class RemissSorterare:
     """Huvudklass för remissortering"""
     
-    def __init__(self):
-        """Initierar RemissSorterare"""
+    def __init__(self, ladda_identifierare: bool = True):
+        """
+        Initierar RemissSorterare
+        
+        Args:
+            ladda_identifierare: Om ML- och AI-identifierarna ska laddas. Läsprocesser
+                som bara renderar och OCR-läser behöver dem inte.
+        """
         self.input_mapp = Path(INPUT_MAPP)
         self.output_mapp = Path(OUTPUT_MAPP)
         self.osakert_mapp = Path(OUTPUT_MAPP) / OSAKERT_MAPP
         
-        # Skapa nödvändiga mappar
-        self.output_mapp.mkdir(exist_ok=True)
-        self.osakert_mapp.mkdir(exist_ok=True)
-        
-        # Skapa mappar för varje verksamhet
-        for verksamhet in VERKSAMHETER.keys():
-            (self.output_mapp / verksamhet).mkdir(exist_ok=True)
+        # Skapa nödvändiga mappar och mappar för varje verksamhet. Har de redan
+        # skapats i den här processen räcker en kontroll av output-mappen.
+        mapp_nyckel = (os.path.abspath(self.output_mapp), tuple(VERKSAMHETER))
+        if mapp_nyckel not in _SÄKRADE_MAPPAR or not self.output_mapp.is_dir():
+            self.output_mapp.mkdir(exist_ok=True)
+            self.osakert_mapp.mkdir(exist_ok=True)
+            for verksamhet in VERKSAMHETER.keys():
+                (self.output_mapp / verksamhet).mkdir(exist_ok=True)
+            _SÄKRADE_MAPPAR.add(mapp_nyckel)
         
         # Initiera identifierare
         self.verksamheter = VERKSAMHETER
-        self.ml_identifierare = MLVerksamhetsIdentifierare()
+        self.ml_identifierare = MLVerksamhetsIdentifierare() if ladda_identifierare else None
+        
+        # Nyckelord i gemener och sökautomat byggs från en ögonblicksbild av
+        # VERKSAMHETER och byggs om när verksamheter läggs till eller tas bort
+        self._sökdata_lås = threading.Lock()
+        self._sökdata = None
+        self._hämta_sökdata()
         
         # Initiera AI-identifierare baserat på konfiguration
-        if AI_TYPE == "openai":
+        if not ladda_identifierare:
+            self.ai_identifierare = None
+        elif AI_TYPE == "openai":
             self.ai_identifierare = AIVerksamhetsIdentifierare()
             logger.info("Använder OpenAI AI-identifierare")
         elif AI_TYPE == "lokal":
@@ -119,11 +258,110 @@ class RemissSorterare:
             self.ai_identifierare = None
             logger.warning("Ingen AI-identifierare konfigurerad")
         
+        # AI-resultat per (modellversion, text-hash), så att samma remiss inte skickas till AI:n
+        # igen. Versionen räknas upp när cachen töms, så att svar från en tidigare modell
+        # som kommer efter tömningen inte sparas.
+        self._ai_cache: "OrderedDict[Tuple[int, bytes], Tuple[str, float]]" = OrderedDict()
+        self._ai_cache_version = 0
+        self._ai_cache_lås = threading.Lock()
+        
         # Konfigurera OCR
         pytesseract.pytesseract.tesseract_cmd = 'tesseract'
         
+        # Tesserocr-instanserna skapas vid första OCR-anropet och återanvänds
+        # sedan för alla sidor och PDF:er
+        self.tess_pool: Optional[queue.Queue] = None
+        self._tess_instanser = []
+        self._tess_tillgänglig = TESSEROCR_AVAILABLE
+        self._tess_lås = threading.Lock()
+        
         logger.info("RemissSorterare initialiserad")
     
+    def _hämta_tess_pool(self) -> Optional[queue.Queue]:
+        """
+        Returnerar kön med tesserocr-instanser och skapar den vid behov
+        
+        En PyTessBaseAPI-instans är inte trådsäker, så varje OCR-anrop lånar
+        en instans ur kön och lämnar tillbaka den efteråt.
+        
+        Returns:
+            Kö med PyTessBaseAPI-instanser, eller None om tesserocr inte kan användas
+        """
+        if not self._tess_tillgänglig:
+            return None
+        
+        with self._tess_lås:
+            if self.tess_pool is None:
+                try:
+                    # Tesseract kräver C-locale för att tolka sina konfigurationsfiler
+                    locale.setlocale(locale.LC_ALL, 'C')
+                    psm_match = _PSM_RE.search(OCR_PSM)
+                    psm = PSM(int(psm_match.group(1))) if psm_match else PSM.AUTO
+                    pool = queue.Queue()
+                    for _ in range(_OCR_TRÅDAR):
+                        api = PyTessBaseAPI(lang=OCR_SPRÅK, psm=psm)
+                        self._tess_instanser.append(api)
+                        pool.put(api)
+                    self.tess_pool = pool
+                    logger.info(f"Tesserocr initialiserad med {_OCR_TRÅDAR} instanser, språk: {OCR_SPRÅK}, PSM: {psm}")
+                except Exception as e:
+                    logger.warning(f"Kunde inte initiera tesserocr, använder pytesseract: {e}")
+                    self._tess_tillgänglig = False
+                    self._stäng_tess_instanser()
+                    return None
+        
+        return self.tess_pool
+    
+    def _stäng_tess_instanser(self):
+        """Anropar End() på alla skapade tesserocr-instanser"""
+        for api in self._tess_instanser:
+            api.End()
+        self._tess_instanser = []
+    
+    def stäng(self):
+        """Frigör tesserocr-instanserna"""
+        with self._tess_lås:
+            self._stäng_tess_instanser()
+            self.tess_pool = None
+    
+    def värm_upp(self):
+        """
+        Laddar OCR-, ML- och AI-modeller i förväg
+        
+        Gör att första remissen inte behöver vänta på att tessdata, ML-modellen
+        och den lokala AI-modellen laddas. Anropas av långlivade instanser,
+        t.ex. webbservern, innan de börjar ta emot remisser.
+        """
+        logger.info("Värmer upp OCR och identifierare")
+        
+        try:
+            # En liten tom sida laddar tessdata (och skapar tesserocr-instanserna)
+            self._ocr_sida(np.full((32, 32), 255, dtype=np.uint8))
+        except Exception as e:
+            logger.warning(f"Uppvärmning av OCR misslyckades: {e}")
+        
+        if self.ml_identifierare and self.ml_identifierare.trained:
+            try:
+                self.ml_identifierare.identifiera_verksamhet_batch(["uppvärmning"])
+            except Exception as e:
+                logger.warning(f"Uppvärmning av ML-identifierare misslyckades: {e}")
+        
+        # Bara den lokala AI:n värms upp; ett OpenAI-anrop skulle kosta tokens
+        if isinstance(self.ai_identifierare, LokalAIVerksamhetsIdentifierare):
+            try:
+                self.ai_identifierare.testa_modell()
+            except Exception as e:
+                logger.warning(f"Uppvärmning av AI-identifierare misslyckades: {e}")
+        
+        logger.info("Uppvärmning klar")
+    
+    def __del__(self):
+        """Frigör tesserocr-instansen när objektet städas bort"""
+        try:
+            self.stäng()
+        except Exception:
+            pass
+    
     def _skapa_mappar(self):
         """Skapar nödvändiga mappar för programmet"""
         mappar = [
@@ -140,45 +378,169 @@ class RemissSorterare:
             mapp.mkdir(parents=True, exist_ok=True)
             logger.info(f"Skapade mapp: {mapp}")
     
-    def pdf_till_bilder(self, pdf_sokvag: Path) -> List[Image.Image]:
+    def pdf_till_bilder(self, pdf_sokvag: Path, dpi: int = OCR_DPI_SNABB) -> List[Sidbild]:
         """
         Konverterar PDF till bilder för OCR
         
+        Sidorna renderas direkt till gråskala, med PyMuPDF i processen,
+        annars med pdf2image och Poppler.
+        
         Args:
             pdf_sokvag: Sökväg till PDF-filen
+            dpi: Upplösning att rendera med (standard OCR_DPI_SNABB)
             
         Returns:
-            Lista med PIL Image-objekt
+            Lista med sidbilder (numpy-arrayer från PyMuPDF, annars PIL Image-objekt)
         """
         try:
-            logger.info(f"Konverterar PDF till bilder: {pdf_sokvag}")
-            logger.info(f"PDF-storlek: {os.path.getsize(pdf_sokvag)} bytes")
-            logger.info(f"OCR DPI: {OCR_DPI}")
+            logger.info(f"Konverterar PDF till bilder: {pdf_sokvag} "
+                        f"({os.path.getsize(pdf_sokvag)} bytes, {dpi} DPI)")
             
-            bilder = convert_from_path(pdf_sokvag, dpi=OCR_DPI)
+            if PYMUPDF_AVAILABLE:
+                bilder = self._rendera_med_pymupdf(pdf_sokvag, dpi)
+            else:
+                bilder = convert_from_path(pdf_sokvag, dpi=dpi, thread_count=_RENDER_TRÅDAR, grayscale=True)
             logger.info(f"Skapade {len(bilder)} bilder från PDF")
             
             # Logga information om varje bild
-            for i, bild in enumerate(bilder):
-                logger.info(f"Bild {i+1}: storlek {bild.size}, format {bild.mode}")
+            if logger.isEnabledFor(logging.DEBUG):
+                for i, bild in enumerate(bilder):
+                    if isinstance(bild, np.ndarray):
+                        logger.debug(f"Bild {i+1}: storlek {(bild.shape[1], bild.shape[0])}, format L")
+                    else:
+                        logger.debug(f"Bild {i+1}: storlek {bild.size}, format {bild.mode}")
             
             return bilder
         except Exception as e:
             logger.error(f"Fel vid konvertering av PDF: {e}")
             return []
     
-    def forbattra_bild_for_ocr(self, bild: Image.Image) -> Image.Image:
+    def antal_sidor(self, pdf_sokvag: Path) -> int:
+        """
+        Räknar sidorna i en PDF utan att rendera dem
+        
+        Args:
+            pdf_sokvag: Sökväg till PDF-filen
+            
+        Returns:
+            Antal sidor, eller 0 om filen inte kunde läsas
+        """
+        try:
+            if PYMUPDF_AVAILABLE:
+                with pymupdf.open(pdf_sokvag) as dokument:
+                    return dokument.page_count
+            return int(pdfinfo_from_path(pdf_sokvag)["Pages"])
+        except Exception as e:
+            logger.error(f"Kunde inte läsa sidantal för {pdf_sokvag}: {e}")
+            return 0
+    
+    def iterera_sidor(self, pdf_sokvag: Path, dpi: int = OCR_DPI_SNABB,
+                      start_sida: int = 0) -> Iterator[Sidbild]:
+        """
+        Renderar PDF-sidor en i taget för OCR
+        
+        Till skillnad från pdf_till_bilder hålls bara den aktuella sidan i
+        minnet, och sidor renderas inte i onödan om anroparen slutar iterera.
+        Med pdf2image renderas första sidan separat och resterande sidor
+        parallellt till en temporär mapp först när de behövs.
+        
+        Args:
+            pdf_sokvag: Sökväg till PDF-filen
+            dpi: Upplösning att rendera med (standard OCR_DPI_SNABB)
+            start_sida: Index för första sidan att rendera (standard 0)
+            
+        Yields:
+            Sidbilder i sidordning
+        """
+        if PYMUPDF_AVAILABLE:
+            with pymupdf.open(pdf_sokvag) as dokument:
+                for sida in dokument.pages(start_sida):
+                    yield self._rendera_pymupdf_sida(sida, dpi)
+            return
+        
+        if start_sida == 0:
+            yield from convert_from_path(pdf_sokvag, dpi=dpi, first_page=1, last_page=1, grayscale=True)
+            start_sida = 1
+        
+        with tempfile.TemporaryDirectory() as temp_mapp:
+            sökvägar = convert_from_path(
+                pdf_sokvag, dpi=dpi, first_page=start_sida + 1, thread_count=_RENDER_TRÅDAR,
+                output_folder=temp_mapp, paths_only=True, grayscale=True
+            )
+            for sökväg in sökvägar:
+                bild = Image.open(sökväg)
+                bild.load()
+                os.remove(sökväg)
+                yield bild
+    
+    def _rendera_med_pymupdf(self, pdf_sokvag: Path, dpi: int,
+                             sidnummer: Optional[int] = None) -> List[np.ndarray]:
+        """
+        Renderar PDF-sidor till gråskalebilder med PyMuPDF
+        
+        Args:
+            pdf_sokvag: Sökväg till PDF-filen
+            dpi: Upplösning att rendera med
+            sidnummer: Rendera bara denna sida (1-baserat), annars alla sidor
+            
+        Returns:
+            Lista med gråskalebilder som numpy-arrayer (höjd x bredd, uint8)
+        """
+        bilder = []
+        with pymupdf.open(pdf_sokvag) as dokument:
+            sidor = [dokument[sidnummer - 1]] if sidnummer is not None else dokument
+            for sida in sidor:
+                bilder.append(self._rendera_pymupdf_sida(sida, dpi))
+        return bilder
+    
+    @staticmethod
+    def _rendera_pymupdf_sida(sida, dpi: int) -> np.ndarray:
+        """
+        Renderar en PyMuPDF-sida till en gråskalebild
+        
+        Args:
+            sida: pymupdf.Page
+            dpi: Upplösning att rendera med
+            
+        Returns:
+            Gråskalebild som numpy-array (höjd x bredd, uint8)
+        """
+        pix = sida.get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY, alpha=False)
+        return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+    
+    def _rendera_sida(self, pdf_sokvag: Path, sidnummer: int, dpi: int) -> Optional[Sidbild]:
+        """
+        Renderar om en enskild sida av en PDF
+        
+        Args:
+            pdf_sokvag: Sökväg till PDF-filen
+            sidnummer: Sidnummer (1-baserat)
+            dpi: Upplösning att rendera med
+            
+        Returns:
+            Sidbild eller None vid fel
+        """
+        try:
+            if PYMUPDF_AVAILABLE:
+                return self._rendera_med_pymupdf(pdf_sokvag, dpi, sidnummer)[0]
+            bilder = convert_from_path(pdf_sokvag, dpi=dpi, first_page=sidnummer, last_page=sidnummer, grayscale=True)
+            return bilder[0] if bilder else None
+        except Exception as e:
+            logger.error(f"Fel vid omrendering av sida {sidnummer}: {e}")
+            return None
+    
+    def forbattra_bild_for_ocr(self, bild: Sidbild) -> np.ndarray:
         """
         Förbättrar bildkvalitet för bättre OCR-resultat
         
         Args:
-            bild: PIL Image-objekt
+            bild: PIL Image-objekt eller numpy-array
             
         Returns:
-            Förbättrad PIL Image-objekt
+            Förbättrad bild som numpy-array (skickas direkt till Tesseract)
         """
-        # Konvertera till numpy array
-        img_array = np.array(bild)
+        # Konvertera till numpy array; asarray kopierar inte om bilden redan är en array
+        img_array = np.asarray(bild)
         
         # Konvertera till gråskala
         if len(img_array.shape) == 3:
@@ -186,51 +548,319 @@ class RemissSorterare:
         else:
             gray = img_array
         
-        # Använd adaptiv tröskling för bättre kontrast
-        binary = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+        # Binarisera med Otsu när sidan är tydligt tvåfärgad (text mot bakgrund).
+        # Övriga sidor lämnas i gråskala; Tesseracts LSTM-motor klarar dem bättre
+        # än en hård adaptiv tröskling och binariserar själv vid behov.
+        if self._är_bimodal(gray):
+            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+            return binary
+        
+        # pytesseract tar emot numpy-arrayer direkt, ingen konvertering tillbaka till PIL behövs
+        return gray
+    
+    @staticmethod
+    def _är_bimodal(gray: np.ndarray) -> bool:
+        """
+        Avgör om en gråskalebild har ett tydligt bimodalt histogram
+        
+        Args:
+            gray: Gråskalebild
+            
+        Returns:
+            True om Otsus separationsmått är minst _BIMODAL_GRÄNS
+        """
+        hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+        sannolikheter = hist / hist.sum()
+        nivåer = np.arange(256)
+        
+        total_medel = (sannolikheter * nivåer).sum()
+        total_varians = (sannolikheter * (nivåer - total_medel) ** 2).sum()
+        if total_varians == 0:
+            return False
+        
+        # Mellanklassvarians för varje möjlig tröskel
+        omega = np.cumsum(sannolikheter)
+        medel = np.cumsum(sannolikheter * nivåer)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mellanklass = (total_medel * omega - medel) ** 2 / (omega * (1 - omega))
+        
+        return mellanklass[np.isfinite(mellanklass)].max(initial=0) / total_varians >= _BIMODAL_GRÄNS
+    
+    def _ocr_sida(self, bild: np.ndarray) -> Tuple[str, float]:
+        """
+        Utför OCR på en förbättrad bild
+        
+        Args:
+            bild: Förbättrad bild från forbattra_bild_for_ocr
+            
+        Returns:
+            Tuple med (text, medelkonfidens 0-100)
+        """
+        tess_pool = self._hämta_tess_pool()
+        if tess_pool is not None:
+            höjd, bredd = bild.shape[:2]
+            # Låna en instans så att ingen annan tråd använder den samtidigt
+            tess_api = tess_pool.get()
+            try:
+                tess_api.SetImageBytes(bild.tobytes(), bredd, höjd, 1, bredd)
+                text = tess_api.GetUTF8Text()
+                konfidenser = [k for k in tess_api.AllWordConfidences() if k >= 0]
+            finally:
+                tess_pool.put(tess_api)
+            medelkonfidens = sum(konfidenser) / len(konfidenser) if konfidenser else 0.0
+            return text.strip(), medelkonfidens
+        
+        data = pytesseract.image_to_data(
+            bild,
+            lang=OCR_SPRÅK,
+            config=OCR_PSM,
+            output_type=Output.DICT
         )
+        return self._tolka_ocr_data(data)
+    
+    def _tolka_ocr_data(self, data: Dict[str, list]) -> Tuple[str, float]:
+        """
+        Bygger text och medelkonfidens från Tesseracts orddata
         
-        # Lägg till lite morfologisk operation för att rensa brus
-        kernel = np.ones((1, 1), np.uint8)
-        cleaned = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+        Args:
+            data: Orddata med nycklarna text, conf, block_num, par_num och line_num
+            
+        Returns:
+            Tuple med (text, medelkonfidens 0-100)
+        """
+        # Bygg upp texten rad för rad och samla konfidens för alla ord
+        rader = {}
+        konfidenser = []
+        for ord_text, konf, block, stycke, rad in zip(
+            data['text'], data['conf'], data['block_num'], data['par_num'], data['line_num']
+        ):
+            konf = float(konf)
+            if konf < 0 or not ord_text.strip():
+                continue
+            konfidenser.append(konf)
+            rader.setdefault((block, stycke, rad), []).append(ord_text)
         
-        # Konvertera tillbaka till PIL Image
-        return Image.fromarray(cleaned)
+        text = "\n".join(" ".join(ord_lista) for ord_lista in rader.values())
+        medelkonfidens = sum(konfidenser) / len(konfidenser) if konfidenser else 0.0
+        return text, medelkonfidens
     
-    def extrahera_text_med_ocr(self, bilder: List[Image.Image]) -> str:
+    def _ocr_sidor_batch(self, bilder: List[np.ndarray]) -> Dict[int, Tuple[str, float]]:
         """
-        Utför OCR på bilder och extraherar text
+        Utför OCR på flera förbättrade bilder med ett enda Tesseract-anrop
+        
+        Bilderna skrivs till en temporär mapp och Tesseract får en fillista,
+        så att processen startas och språkmodellen laddas en gång för hela
+        dokumentet i stället för en gång per sida.
         
         Args:
-            bilder: Lista med PIL Image-objekt
+            bilder: Förbättrade bilder från forbattra_bild_for_ocr
             
         Returns:
-            Extraherad text från alla bilder
+            Dict med sidindex -> (text, medelkonfidens 0-100). Sidor som
+            saknas i Tesseracts utdata finns inte med.
         """
-        all_text = ""
+        with tempfile.TemporaryDirectory() as temp_mapp:
+            sökvägar = []
+            for i, bild in enumerate(bilder):
+                # PGM är okomprimerat och går snabbt att skriva och läsa
+                sökväg = os.path.join(temp_mapp, f"sida_{i:04d}.pgm")
+                cv2.imwrite(sökväg, bild)
+                sökvägar.append(sökväg)
+            
+            fillista = os.path.join(temp_mapp, "lista.txt")
+            with open(fillista, 'w', encoding='utf-8') as f:
+                f.write("\n".join(sökvägar) + "\n")
+            
+            resultat = subprocess.run(
+                [pytesseract.pytesseract.tesseract_cmd, fillista, 'stdout',
+                 '-l', OCR_SPRÅK, *OCR_PSM.split(), 'tsv'],
+                capture_output=True,
+                text=True,
+                encoding='utf-8',
+                check=True
+            )
+        
+        # TSV-utdata innehåller page_num (1-baserat) per ord, en sida per bild
+        sidor: Dict[int, Dict[str, list]] = {}
+        for rad in resultat.stdout.splitlines():
+            fält = rad.split('\t', 11)
+            if len(fält) < 12 or fält[0] == 'level':
+                continue
+            data = sidor.setdefault(int(fält[1]) - 1, {
+                'text': [], 'conf': [], 'block_num': [], 'par_num': [], 'line_num': []
+            })
+            data['block_num'].append(int(fält[2]))
+            data['par_num'].append(int(fält[3]))
+            data['line_num'].append(int(fält[4]))
+            data['conf'].append(float(fält[10]))
+            data['text'].append(fält[11])
+        
+        return {i: self._tolka_ocr_data(data) for i, data in sidor.items()}
+    
+    def _omrendera_vid_låg_konfidens(self, pdf_sokvag: Optional[Path], sidindex: int,
+                                      text: str, konfidens: float) -> Tuple[str, float]:
+        """
+        Renderar om en sida med OCR_DPI om OCR-konfidensen är för låg
         
-        for i, bild in enumerate(bilder):
-            logger.info(f"Utför OCR på bild {i+1}/{len(bilder)}")
+        Args:
+            pdf_sokvag: Sökväg till PDF-filen (None hoppar över omrendering)
+            sidindex: Sidans index (0-baserat)
+            text: Text från första OCR-försöket
+            konfidens: Konfidens från första OCR-försöket
             
+        Returns:
+            Tuple med (text, konfidens) från det bästa försöket
+        """
+        if pdf_sokvag is None or konfidens >= OCR_MIN_KONFIDENS or OCR_DPI_SNABB >= OCR_DPI:
+            return text, konfidens
+        
+        logger.info(f"Låg OCR-konfidens på bild {sidindex+1} ({konfidens:.1f}), renderar om med {OCR_DPI} DPI")
+        högupplöst_bild = self._rendera_sida(pdf_sokvag, sidindex + 1, OCR_DPI)
+        if högupplöst_bild is not None:
+            ny_text, ny_konfidens = self._ocr_sida(self.forbattra_bild_for_ocr(högupplöst_bild))
+            if ny_konfidens > konfidens:
+                return ny_text, ny_konfidens
+        return text, konfidens
+    
+    def extrahera_text_per_sida(self, bilder: Iterable[Sidbild],
+                                pdf_sokvag: Optional[Path] = None,
+                                start_sida: int = 0) -> Iterator[Tuple[int, str]]:
+        """
+        Utför OCR sida för sida och lämnar ut texten efter hand
+        
+        Sidor med låg OCR-konfidens renderas om med OCR_DPI om PDF-filens
+        sökväg anges. Anroparen kan sluta iterera för att hoppa över
+        återstående sidor.
+        
+        Args:
+            bilder: Sidbilder från pdf_till_bilder eller iterera_sidor
+            pdf_sokvag: Sökväg till PDF-filen som bilderna kommer från (valfritt)
+            start_sida: Sidindex för första bilden, om iterera_sidor började
+                på en senare sida (standard 0)
+            
+        Yields:
+            Tuple med (sidindex, text)
+        """
+        for i, bild in enumerate(bilder, start_sida):
             # Förbättra bildkvalitet
             forbattrad_bild = self.forbattra_bild_for_ocr(bild)
             
             try:
                 # Utför OCR med svenska språk
-                logger.info(f"Utför OCR på bild {i+1} med språk: {OCR_SPRÅK}, PSM: {OCR_PSM}")
-                text = pytesseract.image_to_string(
-                    forbattrad_bild, 
-                    lang=OCR_SPRÅK,
-                    config=OCR_PSM
-                )
-                all_text += text + "\n"
-                logger.info(f"Extraherade {len(text)} tecken från bild {i+1}")
-                logger.debug(f"OCR-text från bild {i+1}: {text[:200]}...")
+                text, konfidens = self._ocr_sida(forbattrad_bild)
+                
+                # Rendera om sidan med högre upplösning vid låg konfidens
+                text, konfidens = self._omrendera_vid_låg_konfidens(pdf_sokvag, i, text, konfidens)
+                self._logga_sida(i, text, konfidens)
             except Exception as e:
                 logger.error(f"OCR-fel på bild {i+1}: {e}")
+                continue
+            
+            yield i, text
+    
+    def _extrahera_text_parallellt(self, bilder: List[Sidbild], pdf_sokvag: Optional[Path] = None) -> str:
+        """
+        Förbättrar och OCR:ar sidor parallellt med tesserocr
+        
+        Tesseract och OpenCV släpper GIL, så trådar räcker för att använda
+        flera kärnor. Resultaten sätts ihop i sidordning.
+        
+        Args:
+            bilder: Lista med sidbilder från pdf_till_bilder
+            pdf_sokvag: Sökväg till PDF-filen som bilderna kommer från (valfritt)
+            
+        Returns:
+            Extraherad text från alla bilder
+        """
+        logger.info(f"Utför OCR på {len(bilder)} bilder med {_OCR_TRÅDAR} trådar, språk: {OCR_SPRÅK}, PSM: {OCR_PSM}")
+        
+        sidresultat = []
+        with ThreadPoolExecutor(max_workers=min(_OCR_TRÅDAR, len(bilder))) as executor:
+            framtider = [
+                executor.submit(lambda b: self._ocr_sida(self.forbattra_bild_for_ocr(b)), bild)
+                for bild in bilder
+            ]
+            
+            for i, framtid in enumerate(framtider):
+                try:
+                    text, konfidens = framtid.result()
+                    text, konfidens = self._omrendera_vid_låg_konfidens(pdf_sokvag, i, text, konfidens)
+                    self._logga_sida(i, text, konfidens)
+                except Exception as e:
+                    logger.error(f"OCR-fel på bild {i+1}: {e}")
+                    continue
+                sidresultat.append((text, konfidens))
+        
+        return self._sammanfoga_sidor(len(bilder), sidresultat)
+    
+    def extrahera_text_med_ocr(self, bilder: List[Sidbild], pdf_sokvag: Optional[Path] = None) -> str:
+        """
+        Utför OCR på bilder och extraherar text
         
-        return all_text
+        Med tesserocr förbättras och tolkas sidorna parallellt i en trådpool,
+        en tesserocr-instans per tråd. Annars körs alla sidor genom
+        Tesseract i ett och samma anrop. Sidor som saknas i resultatet,
+        eller hela dokumentet om batchanropet misslyckas, körs om sida
+        för sida.
+        
+        Args:
+            bilder: Lista med sidbilder från pdf_till_bilder
+            pdf_sokvag: Sökväg till PDF-filen som bilderna kommer från (valfritt)
+            
+        Returns:
+            Extraherad text från alla bilder
+        """
+        if bilder and self._hämta_tess_pool() is not None:
+            return self._extrahera_text_parallellt(bilder, pdf_sokvag)
+        
+        forbattrade_bilder = [self.forbattra_bild_for_ocr(bild) for bild in bilder]
+        
+        resultat = {}
+        if forbattrade_bilder:
+            try:
+                logger.info(f"Utför OCR på {len(bilder)} bilder i ett anrop med språk: {OCR_SPRÅK}, PSM: {OCR_PSM}")
+                resultat = self._ocr_sidor_batch(forbattrade_bilder)
+            except Exception as e:
+                logger.warning(f"Batch-OCR misslyckades, kör OCR sida för sida: {e}")
+        
+        sidresultat = []
+        for i, forbattrad_bild in enumerate(forbattrade_bilder):
+            try:
+                if i in resultat:
+                    text, konfidens = resultat[i]
+                else:
+                    text, konfidens = self._ocr_sida(forbattrad_bild)
+                text, konfidens = self._omrendera_vid_låg_konfidens(pdf_sokvag, i, text, konfidens)
+                self._logga_sida(i, text, konfidens)
+            except Exception as e:
+                logger.error(f"OCR-fel på bild {i+1}: {e}")
+                continue
+            sidresultat.append((text, konfidens))
+        
+        return self._sammanfoga_sidor(len(bilder), sidresultat)
+    
+    def _logga_sida(self, sidindex: int, text: str, konfidens: float):
+        """Loggar OCR-resultatet för en sida på DEBUG-nivå"""
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Extraherade {len(text)} tecken från bild {sidindex+1} (konfidens: {konfidens:.1f})")
+            logger.debug(f"OCR-text från bild {sidindex+1}: {text[:200]}...")
+    
+    def _sammanfoga_sidor(self, antal_bilder: int, sidresultat: List[Tuple[str, float]]) -> str:
+        """
+        Sätter ihop sidornas text och loggar en sammanfattning för dokumentet
+        
+        Args:
+            antal_bilder: Antal sidor som skickades till OCR
+            sidresultat: (text, konfidens) för varje sida som lyckades, i sidordning
+            
+        Returns:
+            Sammanfogad text, en rad per sida
+        """
+        text = "".join(sidtext + "\n" for sidtext, _ in sidresultat)
+        medelkonfidens = sum(k for _, k in sidresultat) / len(sidresultat) if sidresultat else 0.0
+        logger.info(f"OCR klar: {len(sidresultat)}/{antal_bilder} sidor, {len(text)} tecken "
+                    f"(medelkonfidens: {medelkonfidens:.1f})")
+        return text
     
     def hitta_personnummer(self, text: str) -> Optional[str]:
         """
@@ -240,17 +870,70 @@ class RemissSorterare:
         Returns:
             Personnummer eller None
         """
-        # Matcha t.ex. '19850415-1234', '198504151234', '19 850415-1234', '20 990101-5678'
-        regex = r'((?:19|20)[ ]?\d{6}-?\d{4})'
-        match = re.search(regex, text)
-        if match:
+        # Första personnumret med giltig kontrollsiffra väljs; annars första träffen,
+        # så att OCR-fel i kontrollsiffran inte gör att personnumret tappas
+        return self._välj_personnummer(*self._sök_personnummer(text))
+    
+    def _sök_personnummer(self, text: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Söker personnummer i texten utan att logga
+        
+        Args:
+            text: Text att söka i
+            
+        Returns:
+            Tuple med (första personnumret med giltig kontrollsiffra, första
+            personnumret oavsett kontrollsiffra); None där inget hittades
+        """
+        första = None
+        for match in _PERSONNUMMER_RE.finditer(text):
             # Ta bort eventuellt mellanslag mellan seklet och resten
             personnummer = match.group(1).replace(' ', '')
-            logger.info(f"Hittade personnummer: {personnummer}")
-            return personnummer
+            if self._giltig_kontrollsiffra(personnummer):
+                return personnummer, första or personnummer
+            if första is None:
+                första = personnummer
+        return None, första
+    
+    @staticmethod
+    def _välj_personnummer(giltigt: Optional[str], första: Optional[str]) -> Optional[str]:
+        """
+        Väljer personnummer efter sökningen i ett dokument och loggar valet
+        
+        Args:
+            giltigt: Första personnumret med giltig kontrollsiffra, eller None
+            första: Första personnumret oavsett kontrollsiffra, eller None
+            
+        Returns:
+            Det giltiga personnumret, annars första träffen, eller None
+        """
+        if giltigt is not None:
+            logger.info(f"Hittade personnummer: {giltigt}")
+            return giltigt
+        if första is not None:
+            logger.info(f"Hittade personnummer (ogiltig kontrollsiffra): {första}")
+            return första
         logger.warning("Inget personnummer hittades")
         return None
     
+    @staticmethod
+    def _giltig_kontrollsiffra(personnummer: str) -> bool:
+        """
+        Kontrollerar personnumrets kontrollsiffra med Luhn-algoritmen
+        
+        Args:
+            personnummer: Personnummer med 12 siffror, med eller utan bindestreck
+            
+        Returns:
+            True om kontrollsiffran stämmer
+        """
+        # Kontrollsiffran räknas på ÅÅMMDDNNNK, utan sekelsiffrorna
+        siffror = personnummer.replace('-', '')[2:]
+        summa = 0
+        for i, siffra in enumerate(siffror):
+            summa += _LUHN_DUBBEL[int(siffra)] if i % 2 == 0 else int(siffra)
+        return summa % 10 == 0
+    
     def hitta_remissdatum(self, text: str) -> Optional[str]:
         """
         Hittar remissdatum i texten
@@ -261,46 +944,55 @@ class RemissSorterare:
         Returns:
             Datum i YYYY-MM-DD format eller None
         """
-        # Olika datumformat att söka efter
-        datum_patterns = [
-            r'\b(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})\b',  # DD/MM/YYYY eller DD-MM-YYYY
-            r'\b(\d{4})-(\d{1,2})-(\d{1,2})\b',  # YYYY-MM-DD
-            r'\b(\d{1,2})\.(\d{1,2})\.(\d{2,4})\b',  # DD.MM.YYYY
-        ]
-        
-        for pattern in datum_patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                try:
-                    if len(match[2]) == 2:  # År med 2 siffror
-                        year = int(match[2])
-                        if year < 50:
-                            year += 2000
-                        else:
-                            year += 1900
-                    else:
-                        year = int(match[2])
-                    
-                    month = int(match[1])
-                    day = int(match[0])
-                    
-                    # Validera datum
-                    if 1900 <= year <= 2100 and 1 <= month <= 12 and 1 <= day <= 31:
-                        datum = f"{year:04d}-{month:02d}-{day:02d}"
-                        logger.info(f"Hittade remissdatum: {datum}")
-                        return datum
-                except (ValueError, IndexError):
-                    continue
+        return self._logga_remissdatum(self._sök_remissdatum(text))
+    
+    @staticmethod
+    def _sök_remissdatum(text: str) -> Optional[str]:
+        """
+        Söker remissdatum i texten utan att logga
         
-        logger.warning("Inget giltigt remissdatum hittades")
+        Args:
+            text: Text att söka i
+            
+        Returns:
+            Första giltiga datum i YYYY-MM-DD format eller None
+        """
+        # Ett enda svep över texten, första giltiga datum returneras direkt
+        for match in _DATUM_RE.finditer(text):
+            datum = _tolka_datum(match.group(0))
+            if datum:
+                return datum
         return None
     
-    def identifiera_verksamhet(self, text: str) -> Tuple[str, float]:
+    @staticmethod
+    def _logga_remissdatum(remissdatum: Optional[str]) -> Optional[str]:
+        """
+        Loggar resultatet av sökningen efter remissdatum i ett dokument
+        
+        Args:
+            remissdatum: Hittat datum eller None
+            
+        Returns:
+            remissdatum oförändrat
+        """
+        if remissdatum:
+            logger.info(f"Hittade remissdatum: {remissdatum}")
+        else:
+            logger.warning("Inget giltigt remissdatum hittades")
+        return remissdatum
+    
+    def identifiera_verksamhet(self, text: str,
+                               ml_resultat: Optional[Tuple[str, float]] = None,
+                               använd_ai: bool = True) -> Tuple[str, float]:
         """
         Identifierar verksamhet med AI som primär metod och fallback till andra metoder
         
         Args:
             text: Text att analysera
+            ml_resultat: Förberäknat (verksamhet, sannolikhet) från ML-identifieraren,
+                t.ex. från identifiera_verksamhet_batch (valfritt)
+            använd_ai: False hoppar över AI-steget och använder bara nyckelord och ML,
+                t.ex. för snabba kontroller under sidläsningen
         
         Returns:
             Tuple med (verksamhet, sannolikhet)
@@ -308,9 +1000,9 @@ class RemissSorterare:
         text_lower = text.lower()
         
         # 1. AI-baserad identifiering (primär metod)
-        if self.ai_identifierare:
+        if använd_ai and self.ai_identifierare:
             try:
-                verksamhet, sannolikhet = self.ai_identifierare.identifiera_verksamhet(text)
+                verksamhet, sannolikhet = self.ai_identifiera(text)
                 if verksamhet != "Okänd" and sannolikhet > 70:
                     logger.info(f"AI-identifiering: {verksamhet} (sannolikhet: {sannolikhet:.1f}%)")
                     return verksamhet, sannolikhet
@@ -327,53 +1019,43 @@ class RemissSorterare:
             except Exception as e:
                 logger.warning(f"AI-identifiering misslyckades, använder fallback: {e}")
         
-        # 2. Sök efter mottagare/remissadress (INTE avsändare)
-        mottagarfraser = [
-            "remiss till", "remitteras till", "mottagare:", "mottagande verksamhet:", 
-            "mottagande avdelning:", "remissadress:", "till:", "för:", "till verksamhet:",
-            "till avdelning:", "till klinik:", "till mottagare:", "till specialist:",
-            "remitteras till", "skickas till", "överlämnas till", "överförs till"
-        ]
+        # Positioner för alla nyckelord, mottagarfraser och kliniker i ett svep
+        verksamheter_lc, sökord, sökautomat = self._hämta_sökdata()
+        förekomster = self._hitta_förekomster(text_lower, sökord, sökautomat)
         
-        # Sök efter mottagare i hela texten
-        for fras in mottagarfraser:
-            idx = text_lower.find(fras)
-            if idx != -1:
+        # 2. Sök efter mottagare/remissadress (INTE avsändare)
+        for fras in MOTTAGARFRASER:
+            if fras in förekomster:
+                idx = förekomster[fras][0]
                 # Ta ut text efter frasen (längre kontext)
                 efter = text_lower[idx:idx+200]
                 logger.info(f"Hittade mottagarfras: '{fras}' - analyserar: {efter[:100]}...")
                 
                 # Sök efter verksamheter i mottagartexten
-                for verksamhet, nyckelord in self.verksamheter.items():
+                for verksamhet, nyckelord in verksamheter_lc.items():
                     for nyckel in nyckelord:
-                        if nyckel.lower() in efter:
+                        positioner = förekomster.get(nyckel)
+                        if not positioner:
+                            continue
+                        # Första förekomsten från frasen och framåt måste rymmas i kontexten
+                        i = bisect_left(positioner, idx)
+                        if i < len(positioner) and positioner[i] + len(nyckel) <= idx + 200:
                             logger.info(f"Mottagarmatch: {verksamhet} via '{fras}' och '{nyckel}'")
                             return verksamhet, 95.0
         
         # 3. Sök efter specifika mottagarkliniker/avdelningar
-        mottagarkliniker = {
-            "Ortopedi": ["ortopedklinik", "ortopedkliniken", "ortopedavdelning", "ortopedavdelningen"],
-            "Kirurgi": ["kirurgklinik", "kirurgkliniken", "kirurgavdelning", "kirurgavdelningen"],
-            "Kardiologi": ["kardioklinik", "kardiokliniken", "kardioavdelning", "kardioavdelningen"],
-            "Neurologi": ["neurologklinik", "neurologkliniken", "neurologavdelning", "neurologavdelningen"],
-            "Gastroenterologi": ["gastroklinik", "gastrokliniken", "gastroavdelning", "gastroavdelningen"],
-            "Endokrinologi": ["endokrinklinik", "endokrinkliniken", "endokrinavdelning", "endokrinavdelningen"],
-            "Dermatologi": ["dermaklinik", "dermakliniken", "dermaavdelning", "dermaavdelningen"],
-            "Urologi": ["uroklinik", "urokliniken", "uroavdelning", "uroavdelningen"],
-            "Gynekologi": ["gynekoklinik", "gynekokliniken", "gynekoavdelning", "gynekoavdelningen"],
-            "Oftalmologi": ["ögonklinik", "ögonkliniken", "ögonavdelning", "ögonavdelningen"],
-            "Otorinolaryngologi": ["ent-klinik", "ent-kliniken", "ent-avdelning", "ent-avdelningen"]
-        }
-        
-        for verksamhet, kliniker in mottagarkliniker.items():
+        for verksamhet, kliniker in MOTTAGARKLINIKER.items():
             for klinik in kliniker:
-                if klinik in text_lower:
+                if klinik in förekomster:
                     logger.info(f"Klinikmatch: {verksamhet} via '{klinik}'")
                     return verksamhet, 90.0
         
         # 4. Försök med ML-identifierare
         try:
-            verksamhet, sannolikhet = self.ml_identifierare.identifiera_verksamhet(text)
+            if ml_resultat is not None:
+                verksamhet, sannolikhet = ml_resultat
+            else:
+                verksamhet, sannolikhet = self.ml_identifierare.identifiera_verksamhet(text)
             if sannolikhet > 70:  # Högre tröskel för ML
                 logger.info(f"ML-match: {verksamhet} (sannolikhet: {sannolikhet:.1f}%)")
                 return verksamhet, sannolikhet
@@ -384,43 +1066,38 @@ class RemissSorterare:
         bästa_verksamhet = "Okänd"
         högsta_poäng = 0
         
+        # Sorterade positioner för första förekomsten av varje mottagarfras i texten
+        fras_positioner = sorted(
+            förekomster[fras][0] for fras in MOTTAGARFRASER if fras in förekomster
+        )
+        
         # Skapa en mer intelligent poängsättning
-        for verksamhet, nyckelord in self.verksamheter.items():
+        for verksamhet, nyckelord in verksamheter_lc.items():
             poäng = 0
             total_nyckelord = len(nyckelord)
             
+            # Extra poäng för specifika termer. Termerna finns med i förekomsterna, så
+            # summan räknas ut en gång per verksamhet, men läggs som förut till för
+            # varje matchat nyckelord nedan
+            specifika_termer = _SPECIFIKA_TERMER.get(verksamhet)
+            term_poäng = 15 * sum(term in förekomster for term in specifika_termer) if specifika_termer else 0
+            
             # Räkna förekomster av varje nyckelord
             for nyckel in nyckelord:
-                antal = text_lower.count(nyckel.lower())
-                if antal > 0:
+                positioner = förekomster.get(nyckel)
+                if positioner:
                     # Ge högre poäng för fler förekomster
-                    poäng += antal * 2
+                    poäng += self._antal_utan_överlapp(positioner, len(nyckel)) * 2
                     
                     # Ge extra poäng om nyckelordet finns nära mottagarfraser
-                    for fras in mottagarfraser:
-                        if fras in text_lower:
-                            fras_idx = text_lower.find(fras)
-                            nyckel_idx = text_lower.find(nyckel.lower())
-                            if abs(fras_idx - nyckel_idx) < 100:  # Nära varandra
-                                poäng += 10  # Öka från 5 till 10
-                    
-                    # Ge extra poäng för specifika gynekologiska termer
-                    if verksamhet == "Gynekologi":
-                        gynekologiska_termer = ["livmoder", "äggstockar", "menstruation", "menopaus", "endometrios", 
-                                              "myom", "cervix", "ovariell", "mammografi", "bröst", "graviditet", 
-                                              "förlossning", "uterus", "ovarium"]
-                        for term in gynekologiska_termer:
-                            if term in text_lower:
-                                poäng += 15  # Extra poäng för specifika gynekologiska termer
+                    # (färre än 100 tecken isär, räknat från första förekomsten)
+                    nyckel_idx = positioner[0]
+                    nära = (bisect_left(fras_positioner, nyckel_idx + 100)
+                            - bisect_right(fras_positioner, nyckel_idx - 100))
+                    poäng += nära * 10  # Öka från 5 till 10
                     
-                    # Ge extra poäng för specifika kirurgiska termer
-                    if verksamhet == "Kirurgi":
-                        kirurgiska_termer = ["operation", "operera", "kirurgisk", "snitt", "laparoskopi", 
-                                           "endoskopi", "biopsi", "appendicit", "gallsten", "hernia", 
-                                           "bråck", "polyp", "cholecystektomi", "appendektomi"]
-                        for term in kirurgiska_termer:
-                            if term in text_lower:
-                                poäng += 15  # Extra poäng för specifika kirurgiska termer
+                    # Ge extra poäng för specifika gynekologiska/kirurgiska termer
+                    poäng += term_poäng
             
             # Normalisera poäng - använd en mer balanserad formel
             sannolikhet = min(100, (poäng / total_nyckelord) * 15)  # Minska från 20 till 15
@@ -441,6 +1118,143 @@ class RemissSorterare:
         
         return bästa_verksamhet, högsta_poäng
     
+    def _hämta_sökdata(self) -> Tuple[Dict[str, List[str]], List[str], Any]:
+        """
+        Returnerar nyckelord i gemener, sökord och sökautomat för VERKSAMHETER
+        
+        Allt byggs om när VERKSAMHETER har ändrats sedan förra anropet, t.ex. när
+        en verksamhet lagts till eller tagits bort i webbgränssnittet.
+        
+        Returns:
+            Tuple med (verksamhet -> nyckelord i gemener, sorterade sökord,
+            ahocorasick.Automaton eller None)
+        """
+        verksamheter = tuple((verksamhet, tuple(nyckelord)) for verksamhet, nyckelord in self.verksamheter.items())
+        
+        with self._sökdata_lås:
+            if self._sökdata is None or self._sökdata[0] != verksamheter:
+                verksamheter_lc = {
+                    verksamhet: [nyckel.lower() for nyckel in nyckelord]
+                    for verksamhet, nyckelord in verksamheter
+                }
+                
+                # Alla ord som identifiera_verksamhet letar efter, i gemener
+                sökord = {nyckel for nyckelord in verksamheter_lc.values() for nyckel in nyckelord}
+                sökord.update(MOTTAGARFRASER)
+                sökord.update(klinik for kliniker in MOTTAGARKLINIKER.values() for klinik in kliniker)
+                sökord.update(_GYN_TERMER | _KIR_TERMER)
+                sökord = sorted(ord_ for ord_ in sökord if ord_)
+                
+                self._sökdata = (verksamheter, verksamheter_lc, sökord, self._bygg_sökautomat(sökord))
+            return self._sökdata[1:]
+    
+    def _bygg_sökautomat(self, sökord: List[str]):
+        """
+        Bygger en Aho-Corasick-automat över alla sökord
+        
+        Args:
+            sökord: Ord och fraser i gemener
+            
+        Returns:
+            ahocorasick.Automaton, eller None om pyahocorasick saknas
+        """
+        if not AHOCORASICK_AVAILABLE:
+            return None
+        
+        automat = ahocorasick.Automaton()
+        for ord_ in sökord:
+            automat.add_word(ord_, ord_)
+        automat.make_automaton()
+        return automat
+    
+    def _hitta_förekomster(self, text_lower: str, sökord: List[str], sökautomat) -> Dict[str, List[int]]:
+        """
+        Hittar startpositionerna för alla sökord i texten
+        
+        Med pyahocorasick görs ett enda svep över texten oavsett antal sökord.
+        
+        Args:
+            text_lower: Text i gemener
+            sökord: Sorterade sökord från _hämta_sökdata
+            sökautomat: Sökautomat från _hämta_sökdata, eller None
+            
+        Returns:
+            Dict med sökord -> sorterade startpositioner (även överlappande).
+            Sökord som inte förekommer finns inte med.
+        """
+        förekomster: Dict[str, List[int]] = {}
+        if sökautomat is not None:
+            # iter ger träffarna i ordning efter slutposition, vilket för ett
+            # och samma ord även är ordningen efter startposition
+            for slut, ord_ in sökautomat.iter(text_lower):
+                förekomster.setdefault(ord_, []).append(slut - len(ord_) + 1)
+            return förekomster
+        
+        for ord_ in sökord:
+            idx = text_lower.find(ord_)
+            while idx != -1:
+                förekomster.setdefault(ord_, []).append(idx)
+                idx = text_lower.find(ord_, idx + 1)
+        return förekomster
+    
+    @staticmethod
+    def _antal_utan_överlapp(positioner: List[int], längd: int) -> int:
+        """
+        Räknar förekomster som inte överlappar varandra, som str.count
+        
+        Args:
+            positioner: Sorterade startpositioner
+            längd: Ordets längd
+            
+        Returns:
+            Antal förekomster utan överlapp
+        """
+        antal = 0
+        nästa_fria = 0
+        for pos in positioner:
+            if pos >= nästa_fria:
+                antal += 1
+                nästa_fria = pos + längd
+        return antal
+    
+    def ai_identifiera(self, text: str) -> Tuple[str, float]:
+        """
+        Identifierar verksamhet med AI-identifieraren, med cache per text
+        
+        "Okänd" cachas inte eftersom AI-identifierarna även returnerar det
+        vid tillfälliga fel, t.ex. när tjänsten inte svarar.
+        
+        Args:
+            text: Text att analysera
+            
+        Returns:
+            Tuple med (verksamhet, sannolikhet)
+        """
+        texthash = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        with self._ai_cache_lås:
+            nyckel = (self._ai_cache_version, texthash)
+            resultat = self._ai_cache.get(nyckel)
+            if resultat is not None:
+                self._ai_cache.move_to_end(nyckel)
+        if resultat is not None:
+            logger.info(f"AI-resultat hämtat från cache: {resultat[0]} (sannolikhet: {resultat[1]:.1f}%)")
+            return resultat
+        
+        resultat = self.ai_identifierare.identifiera_verksamhet(text)
+        if resultat[0] != "Okänd":
+            with self._ai_cache_lås:
+                if nyckel[0] == self._ai_cache_version:
+                    self._ai_cache[nyckel] = resultat
+                    while len(self._ai_cache) > IDENTIFIERING_CACHE_STORLEK:
+                        self._ai_cache.popitem(last=False)
+        return resultat
+    
+    def rensa_ai_cache(self):
+        """Tömmer cachade AI-resultat, t.ex. när AI-modellen bytts"""
+        with self._ai_cache_lås:
+            self._ai_cache_version += 1
+            self._ai_cache.clear()
+    
     def _kontrollera_nyckelordsmatchning(self, text: str, verksamhet: str) -> bool:
         """
         Kontrollerar om det finns tydliga nyckelord i texten som stödjer verksamhetsidentifieringen
@@ -456,12 +1270,12 @@ class RemissSorterare:
             return False
             
         text_lower = text.lower()
-        nyckelord = self.verksamheter[verksamhet]
+        nyckelord = self._hämta_sökdata()[0].get(verksamhet, [])
         
         # Räkna antal matchande nyckelord
         matchande_nyckelord = []
         for nyckel in nyckelord:
-            if nyckel.lower() in text_lower:
+            if nyckel in text_lower:
                 matchande_nyckelord.append(nyckel)
         
         # Om det finns minst ett matchande nyckelord, anses det som stöd
@@ -486,81 +1300,265 @@ class RemissSorterare:
         dat_namn = pdf_namn.replace('.pdf', '.dat')
         dat_sokvag = mapp / dat_namn
         
+        # Bygg hela innehållet först och skriv det med ett enda anrop
+        innehåll = (
+            f"Verksamhet: {verksamhet}\n"
+            f"Personnummer: {personnummer}\n"
+            f"Remissdatum: {remissdatum}\n"
+            f"Skapad: {datetime.now():%Y-%m-%d %H:%M:%S}\n"
+        )
+        
         try:
-            with open(dat_sokvag, 'w', encoding='utf-8') as f:
-                f.write(f"Verksamhet: {verksamhet}\n")
-                f.write(f"Personnummer: {personnummer}\n")
-                f.write(f"Remissdatum: {remissdatum}\n")
-                f.write(f"Skapad: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            dat_sokvag.write_bytes(innehåll.encode('utf-8'))
             
             logger.info(f"Skapade .dat-fil: {dat_sokvag}")
         except Exception as e:
             logger.error(f"Fel vid skapande av .dat-fil: {e}")
     
-    def bearbeta_pdf(self, pdf_sokvag: Path) -> bool:
+    def bearbeta_pdf(self, pdf_sokvag: Path, remiss: Optional[Dict] = None) -> bool:
         """
         Bearbetar en PDF-fil genom hela processen
         
         Args:
             pdf_sokvag: Sökväg till PDF-filen
+            remiss: Resultat från _läs_remiss för samma fil (valfritt). Läsningen
+                fortsätter då efter de redan lästa sidorna i stället för från början.
             
         Returns:
             True om bearbetningen lyckades, False annars
         """
         try:
-            logger.info(f"Börjar bearbeta: {pdf_sokvag}")
+            if remiss is None:
+                logger.info(f"Börjar bearbeta: {pdf_sokvag}")
+            else:
+                logger.info(f"Fortsätter bearbeta {pdf_sokvag} från sida {remiss['lästa_sidor']+1}")
             
-            # Konvertera PDF till bilder
-            bilder = self.pdf_till_bilder(pdf_sokvag)
-            if not bilder:
+            antal_sidor = self.antal_sidor(pdf_sokvag)
+            if not antal_sidor:
                 return False
             
-            # Extrahera text med OCR
-            text = self.extrahera_text_med_ocr(bilder)
+            # Rendera och extrahera text med OCR sida för sida. Så snart personnummer,
+            # datum och en säker verksamhet hittats hoppas resterande sidor över. Kontrollen
+            # efter varje sida görs utan AI, eftersom texten växer och AI-cachen aldrig träffar.
+            # Sökningen efter personnummer avslutas först när ett med giltig kontrollsiffra
+            # hittats; annars används första träffen när alla lästa sidor sökts igenom.
+            # Personnummer och datum söks bara i den nya sidan och loggas en gång efter
+            # loopen, så att texten inte söks om för varje sida.
+            if remiss is None:
+                text = ""
+                personnummer = None
+                första_personnummer = None
+                remissdatum = None
+                start_sida = 0
+            else:
+                text = remiss['text']
+                första_personnummer = remiss['personnummer']
+                if första_personnummer and self._giltig_kontrollsiffra(första_personnummer):
+                    personnummer = första_personnummer
+                else:
+                    personnummer = None
+                remissdatum = remiss['remissdatum']
+                start_sida = remiss['lästa_sidor']
+            identifiering = None
+            sidor = self.iterera_sidor(pdf_sokvag, start_sida=start_sida)
+            for sida, sidtext in self.extrahera_text_per_sida(sidor, pdf_sokvag, start_sida):
+                text += sidtext + "\n"
+                identifiering = None
+                if not sidtext.strip():
+                    continue
+                
+                if personnummer is None:
+                    personnummer, första = self._sök_personnummer(sidtext)
+                    första_personnummer = första_personnummer or första
+                remissdatum = remissdatum or self._sök_remissdatum(sidtext)
+                if personnummer and remissdatum:
+                    identifiering = self.identifiera_verksamhet(text, använd_ai=False)
+                    if identifiering[1] >= SANNOLIKHET_TRÖSKEL:
+                        if sida + 1 < antal_sidor:
+                            logger.info(f"All information hittad efter sida {sida+1}/{antal_sidor}, hoppar över resterande sidor")
+                        break
+            
             if not text.strip():
                 logger.warning("Ingen text extraherades från PDF")
                 return False
             
-            # Identifiera verksamhet
-            verksamhet, sannolikhet = self.identifiera_verksamhet(text)
-            
-            # Extrahera personnummer och datum
-            personnummer = self.hitta_personnummer(text)
-            remissdatum = self.hitta_remissdatum(text)
+            personnummer = self._välj_personnummer(personnummer, första_personnummer)
+            remissdatum = self._logga_remissdatum(remissdatum)
             
-            # Bestäm mål-mapp baserat på sannolikhet
-            if sannolikhet >= SANNOLIKHET_TRÖSKEL:
-                mål_mapp = self.output_mapp / verksamhet
-                logger.info(f"Remiss sorteras till {verksamhet} (sannolikhet: {sannolikhet:.1f}%)")
-            else:
-                mål_mapp = self.osakert_mapp
-                logger.warning(f"Remiss flyttas till osakert (sannolikhet: {sannolikhet:.1f}%)")
-            
-            # Kopiera PDF till mål-mapp
-            pdf_namn = pdf_sokvag.name
-            mål_pdf = mål_mapp / pdf_namn
-            shutil.copy2(pdf_sokvag, mål_pdf)
-            logger.info(f"Kopierade PDF till: {mål_pdf}")
-            
-            # Skapa .dat-fil
-            if personnummer:
-                self.skapa_dat_fil(verksamhet, personnummer, remissdatum or "Okänt", pdf_namn, mål_mapp)
-            else:
-                logger.warning("Kunde inte skapa .dat-fil - saknar personnummer")
+            # Identifiera verksamhet på hela den lästa texten, med AI en gång. Utan AI
+            # återanvänds kontrollen från sista sidan om den gjordes på samma text.
+            if identifiering is None or self.ai_identifierare:
+                identifiering = self.identifiera_verksamhet(text)
+            verksamhet, sannolikhet = identifiering
             
+            self._sortera_remiss(pdf_sokvag, verksamhet, sannolikhet, personnummer, remissdatum)
             return True
             
         except Exception as e:
             logger.error(f"Fel vid bearbetning av {pdf_sokvag}: {e}")
             return False
     
-    def bearbeta_alla_pdf(self):
-        """Bearbetar alla PDF-filer i input-mappen"""
+    def _sortera_remiss(self, pdf_sokvag: Path, verksamhet: str, sannolikhet: float,
+                        personnummer: Optional[str], remissdatum: Optional[str]):
+        """
+        Kopierar PDF-filen till rätt mapp och skapar .dat-fil
+        
+        Args:
+            pdf_sokvag: Sökväg till PDF-filen
+            verksamhet: Identifierad verksamhet
+            sannolikhet: Sannolikhet för verksamheten
+            personnummer: Patientens personnummer eller None
+            remissdatum: Datum för remissen eller None
+        """
+        # Bestäm mål-mapp baserat på sannolikhet
+        if sannolikhet >= SANNOLIKHET_TRÖSKEL:
+            mål_mapp = self.output_mapp / verksamhet
+            logger.info(f"Remiss sorteras till {verksamhet} (sannolikhet: {sannolikhet:.1f}%)")
+        else:
+            mål_mapp = self.osakert_mapp
+            logger.warning(f"Remiss flyttas till osakert (sannolikhet: {sannolikhet:.1f}%)")
+        
+        # Kopiera PDF till mål-mapp
+        pdf_namn = pdf_sokvag.name
+        mål_pdf = mål_mapp / pdf_namn
+        self.kopiera_pdf(pdf_sokvag, mål_pdf)
+        logger.info(f"Kopierade PDF till: {mål_pdf}")
+        
+        # Skapa .dat-fil
+        if personnummer:
+            self.skapa_dat_fil(verksamhet, personnummer, remissdatum or "Okänt", pdf_namn, mål_mapp)
+        else:
+            logger.warning("Kunde inte skapa .dat-fil - saknar personnummer")
+    
+    @staticmethod
+    def kopiera_pdf(källa: Path, mål: Path):
+        """
+        Kopierar en PDF till mål-mappen utan att läsa om filen om det går
+        
+        På samma filsystem skapas en hårdlänk, så inga data kopieras. Annars
+        används shutil.copyfile, som kopierar i kärnan (sendfile/copy_file_range),
+        följt av copystat så att tidsstämplarna bevaras som med copy2.
+        
+        Args:
+            källa: PDF-filen som ska kopieras
+            mål: Sökväg till kopian
+        """
+        try:
+            # En befintlig fil tas bort först, så att en gammal hårdlänk inte skrivs över på plats
+            if os.path.lexists(mål):
+                os.unlink(mål)
+            os.link(källa, mål)
+        except OSError:
+            shutil.copyfile(källa, mål)
+            shutil.copystat(källa, mål)
+    
+    def _läs_remiss(self, pdf_sokvag: Path) -> Optional[Dict]:
+        """
+        Läser en remiss med OCR tills personnummer och remissdatum hittats
+        
+        Args:
+            pdf_sokvag: Sökväg till PDF-filen
+            
+        Returns:
+            Dictionary med text, personnummer, remissdatum, antal lästa sidor och
+            om alla sidor lästes, eller None om ingen text kunde extraheras
+        """
+        antal_sidor = self.antal_sidor(pdf_sokvag)
+        if not antal_sidor:
+            return None
+        
+        # Läsningen fortsätter tills ett personnummer med giltig kontrollsiffra hittats;
+        # annars används första träffen när alla sidor sökts igenom. Varje sida söks
+        # igenom en gång och resultatet loggas efter loopen.
+        text = ""
+        personnummer = None
+        första_personnummer = None
+        remissdatum = None
+        alla_sidor_lästa = True
+        sidor = self.iterera_sidor(pdf_sokvag)
+        for sida, sidtext in self.extrahera_text_per_sida(sidor, pdf_sokvag):
+            text += sidtext + "\n"
+            if not sidtext.strip():
+                continue
+            
+            if personnummer is None:
+                personnummer, första = self._sök_personnummer(sidtext)
+                första_personnummer = första_personnummer or första
+            remissdatum = remissdatum or self._sök_remissdatum(sidtext)
+            if personnummer and remissdatum:
+                alla_sidor_lästa = sida + 1 >= antal_sidor
+                break
+        
+        if not text.strip():
+            logger.warning(f"Ingen text extraherades från {pdf_sokvag}")
+            return None
+        
+        personnummer = self._välj_personnummer(personnummer, första_personnummer)
+        remissdatum = self._logga_remissdatum(remissdatum)
+        logger.info(f"Läste {sida+1}/{antal_sidor} sidor av {pdf_sokvag.name}, {len(text)} tecken")
+        return {
+            'text': text,
+            'personnummer': personnummer,
+            'remissdatum': remissdatum,
+            'lästa_sidor': sida + 1,
+            'alla_sidor_lästa': alla_sidor_lästa
+        }
+    
+    def _läs_remisser(self, pdf_filer: List[Path]) -> List[Optional[Dict]]:
+        """
+        Läser flera remisser med OCR, parallellt i en processpool
+        
+        Varje process har en egen RemissSorterare så att rendering och OCR
+        av en långsam PDF inte blockerar de andra. Filer skrivs inte här,
+        sorteringen görs av anroparen i huvudprocessen.
+        
+        Args:
+            pdf_filer: Lista med sökvägar till PDF-filer
+            
+        Returns:
+            Resultat från _läs_remiss per fil, i samma ordning som pdf_filer
+        """
+        if _PDF_PROCESSER < 2 or len(pdf_filer) < 2:
+            return [_läs_remiss_säkert(self, pdf_fil) for pdf_fil in pdf_filer]
+        
+        processer = min(_PDF_PROCESSER, len(pdf_filer))
+        logger.info(f"Läser {len(pdf_filer)} PDF-filer med {processer} processer")
+        try:
+            with ProcessPoolExecutor(max_workers=processer, initializer=_initiera_läsprocess,
+                                     initargs=(processer,)) as executor:
+                return list(executor.map(_läs_remiss_i_process, pdf_filer))
+        except Exception as e:
+            logger.error(f"Processpoolen misslyckades, läser filerna sekventiellt: {e}")
+            return [_läs_remiss_säkert(self, pdf_fil) for pdf_fil in pdf_filer]
+    
+    def hitta_pdf_filer(self) -> List[Path]:
+        """
+        Listar PDF-filerna i input-mappen
+        
+        Returns:
+            Lista med sökvägar till PDF-filer
+        """
+        # En scandir-passage; DirEntry.is_file() använder d_type från katalogläsningen
+        with os.scandir(self.input_mapp) as poster:
+            return [
+                Path(post.path) for post in poster
+                if post.name.endswith('.pdf') and post.is_file()
+            ]
+    
+    def bearbeta_alla_pdf(self, pdf_filer: Optional[List[Path]] = None):
+        """
+        Bearbetar alla PDF-filer i input-mappen
+        
+        Args:
+            pdf_filer: PDF-filer från hitta_pdf_filer, om anroparen redan
+                listat input-mappen (valfritt)
+        """
         if not self.input_mapp.exists():
             logger.error(f"Input-mapp finns inte: {self.input_mapp}")
             return
         
-        pdf_filer = list(self.input_mapp.glob("*.pdf"))
+        if pdf_filer is None:
+            pdf_filer = self.hitta_pdf_filer()
         
         if not pdf_filer:
             logger.info("Inga PDF-filer hittades i input-mappen")
@@ -570,10 +1568,37 @@ class RemissSorterare:
         lyckade = 0
         misslyckade = 0
 
-        for pdf_fil in pdf_filer:
-            if self.bearbeta_pdf(pdf_fil):
-                lyckade += 1
+        # Fas 1: OCR av alla PDF-filer, flera filer parallellt i egna processer
+        lästa = []
+        for pdf_fil, remiss in zip(pdf_filer, self._läs_remisser(pdf_filer)):
+            if remiss is None:
+                misslyckade += 1
             else:
+                lästa.append((pdf_fil, remiss))
+        
+        # Fas 2: ML-klassificering av alla texter i ett anrop
+        ml_resultat = self.ml_identifierare.identifiera_verksamhet_batch(
+            [remiss['text'] for _, remiss in lästa]
+        )
+        
+        # Fas 3: Identifiering och sortering
+        for (pdf_fil, remiss), ml in zip(lästa, ml_resultat):
+            try:
+                verksamhet, sannolikhet = self.identifiera_verksamhet(remiss['text'], ml_resultat=ml)
+                if sannolikhet < SANNOLIKHET_TRÖSKEL and not remiss['alla_sidor_lästa']:
+                    # Osäker på förstasidorna - läs resterande sidor, de lästa OCR:as inte om
+                    logger.info(f"Osäker identifiering av {pdf_fil.name}, läser resterande sidor")
+                    if self.bearbeta_pdf(pdf_fil, remiss):
+                        lyckade += 1
+                    else:
+                        misslyckade += 1
+                    continue
+                
+                self._sortera_remiss(pdf_fil, verksamhet, sannolikhet,
+                                     remiss['personnummer'], remiss['remissdatum'])
+                lyckade += 1
+            except Exception as e:
+                logger.error(f"Fel vid bearbetning av {pdf_fil}: {e}")
                 misslyckade += 1
 
         logger.info(f"Bearbetning slutförd: {lyckade} lyckade, {misslyckade} misslyckade")
@@ -658,32 +1683,40 @@ class RemissSorterare:
         Returns:
             Lista med dictionaries innehållande remissinformation
         """
-        osakert_remisser = []
-        
         if not self.osakert_mapp.exists():
-            return osakert_remisser
+            return []
+        
+        # En scandir-passage ger både PDF-filerna och vilka .dat-filer som finns
+        with os.scandir(self.osakert_mapp) as poster:
+            namn = [post.name for post in poster]
+        dat_namn = {n for n in namn if n.endswith('.dat')}
+        pdf_namn = [n for n in namn if n.endswith('.pdf')]
         
-        for pdf_fil in self.osakert_mapp.glob("*.pdf"):
+        def läs_remiss_info(pdf: str) -> Dict:
+            pdf_fil = self.osakert_mapp / pdf
+            stat = pdf_fil.stat()
             remiss_info = {
-                "pdf_namn": pdf_fil.name,
-                "storlek": pdf_fil.stat().st_size,
-                "skapad": datetime.fromtimestamp(pdf_fil.stat().st_ctime).strftime('%Y-%m-%d %H:%M:%S'),
+                "pdf_namn": pdf,
+                "storlek": stat.st_size,
+                "skapad": datetime.fromtimestamp(stat.st_ctime).strftime('%Y-%m-%d %H:%M:%S'),
                 "dat_fil": None
             }
             
-            # Kolla om det finns motsvarande .dat-fil
-            dat_fil = pdf_fil.with_suffix('.dat')
-            if dat_fil.exists():
+            # Läs motsvarande .dat-fil om den finns
+            dat = pdf[:-len('.pdf')] + '.dat'
+            if dat in dat_namn:
                 try:
-                    with open(dat_fil, 'r', encoding='utf-8') as f:
-                        innehåll = f.read()
-                        remiss_info["dat_fil"] = innehåll
+                    with open(self.osakert_mapp / dat, 'r', encoding='utf-8') as f:
+                        remiss_info["dat_fil"] = f.read()
                 except Exception as e:
                     logger.warning(f"Kunde inte läsa .dat-fil: {e}")
-            
-            osakert_remisser.append(remiss_info)
+            return remiss_info
         
-        return osakert_remisser
+        # Filerna läses parallellt så att väntan på disken överlappar
+        if len(pdf_namn) < 2:
+            return [läs_remiss_info(pdf) for pdf in pdf_namn]
+        with ThreadPoolExecutor(max_workers=min(8, len(pdf_namn))) as executor:
+            return list(executor.map(läs_remiss_info, pdf_namn))
     
     def träna_ml_med_omfördelningsdata(self, omfördelningsdata: List[Tuple[str, str]]):
         """
@@ -708,7 +1741,7 @@ class RemissSorterare:
                     # Bearbeta PDF för att få text
                     bilder = self.pdf_till_bilder(pdf_sokvag)
                     if bilder:
-                        text = self.extrahera_text_med_ocr(bilder)
+                        text = self.extrahera_text_med_ocr(bilder, pdf_sokvag)
                         if text.strip():
                             texter.append(text)
                             verksamheter.append(rätt_verksamhet)
@@ -725,13 +1758,98 @@ class RemissSorterare:
             logger.error(f"Fel vid träning med omfördelningsdata: {e}")
 
 
+# RemissSorterare för den aktuella läsprocessen i bearbeta_alla_pdf och webbens OCR-pool
+_process_sorterare: Optional[RemissSorterare] = None
+
+
+def _initiera_läsprocess(antal_processer: int = 1):
+    """
+    Skapar processens RemissSorterare en gång när processen startar
+    
+    Args:
+        antal_processer: Antal processer i poolen; kärnorna delas mellan dem
+    """
+    global _process_sorterare, _RENDER_TRÅDAR, _OCR_TRÅDAR
+    # Flera processer kör OCR samtidigt, så varje Tesseract-anrop får en tråd
+    # i stället för att alla konkurrerar om samma kärnor med OpenMP
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+    # Samma sak för pdftoppm och OCR-trådarna: processerna tillsammans ska
+    # inte använda fler kärnor än som finns
+    kärnor_per_process = max(1, (os.cpu_count() or 1) // max(1, antal_processer))
+    _RENDER_TRÅDAR = min(_RENDER_TRÅDAR, kärnor_per_process)
+    _OCR_TRÅDAR = min(_OCR_TRÅDAR, kärnor_per_process)
+    # Identifieringen görs i huvudprocessen, så ML- och AI-modellerna laddas inte här
+    _process_sorterare = RemissSorterare(ladda_identifierare=False)
+
+
+def _läs_remiss_säkert(sorterare: RemissSorterare, pdf_sokvag: Path) -> Optional[Dict]:
+    """
+    Läser en remiss och loggar fel i stället för att kasta dem
+    
+    Args:
+        sorterare: RemissSorterare som utför läsningen
+        pdf_sokvag: Sökväg till PDF-filen
+        
+    Returns:
+        Resultat från _läs_remiss, eller None vid fel
+    """
+    logger.info(f"Börjar bearbeta: {pdf_sokvag}")
+    try:
+        return sorterare._läs_remiss(pdf_sokvag)
+    except Exception as e:
+        logger.error(f"Fel vid bearbetning av {pdf_sokvag}: {e}")
+        return None
+
+
+def _läs_remiss_i_process(pdf_sokvag: Path) -> Optional[Dict]:
+    """Läser en remiss i en process i processpoolen"""
+    try:
+        return _läs_remiss_säkert(_process_sorterare, pdf_sokvag)
+    finally:
+        # Processpoolens processer avslutas utan att logging stängs, töm bufferten
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+
+
+def _extrahera_text_i_process(pdf_sokvag: Path) -> str:
+    """Renderar och OCR-läser alla sidor i en PDF i en process i processpoolen"""
+    try:
+        bilder = _process_sorterare.pdf_till_bilder(pdf_sokvag)
+        if not bilder:
+            raise Exception("Kunde inte konvertera PDF till bilder")
+        return _process_sorterare.extrahera_text_med_ocr(bilder, pdf_sokvag)
+    finally:
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+
+
+def _värm_upp_läsprocess() -> int:
+    """
+    Laddar tessdata i en process i processpoolen genom att OCR-läsa en tom sida
+    
+    Fel loggas i processen i stället för att kastas, så att uppvärmningen aldrig
+    lämnar tillbaka ett undantag som inte kan skickas mellan processerna.
+    
+    Returns:
+        Processens PID
+    """
+    try:
+        _process_sorterare._ocr_sida(np.full((32, 32), 255, dtype=np.uint8))
+    except Exception as e:
+        logger.warning(f"Uppvärmning av OCR i process {os.getpid()} misslyckades: {e}")
+    return os.getpid()
+
+
 def main():
     """Huvudfunktion"""
     logger.info("Startar Remissorterare")
     
     # Skapa sorterare och bearbeta filer
     sorterare = RemissSorterare()
-    sorterare.bearbeta_alla_pdf()
+    try:
+        sorterare.bearbeta_alla_pdf()
+    finally:
+        sorterare.stäng()
     
     logger.info("Remissorterare slutförd")
 
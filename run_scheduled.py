@@ -7,9 +7,11 @@ Används för automatisk körning via cron eller Task Scheduler
 import os
 import sys
 import logging
+import logging.handlers
+import queue
 import smtplib
+import threading
 from datetime import datetime
-from pathlib import Path
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
@@ -20,15 +22,18 @@ from remiss_sorterare import RemissSorterare
 from config import *
 
 # Konfigurera logging för schemalagd körning
+# remiss_sorterare har redan satt upp rotloggern (loggfil och konsol), så körningens
+# egen loggfil läggs till via en kö. En bakgrundstråd skriver posterna i block om 100.
 log_file = f"scheduled_run_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-logging.basicConfig(
-    level=getattr(logging, LOG_NIVÅ),
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
+_log_kö = queue.Queue(-1)
+_körningslogg = logging.FileHandler(log_file)
+_körningslogg.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+_log_lyssnare = logging.handlers.QueueListener(
+    _log_kö,
+    logging.handlers.MemoryHandler(100, flushLevel=logging.WARNING, target=_körningslogg)
 )
+logging.getLogger().addHandler(logging.handlers.QueueHandler(_log_kö))
+_log_lyssnare.start()
 logger = logging.getLogger(__name__)
 
 class ScheduledRunner:
@@ -45,6 +50,39 @@ class ScheduledRunner:
         self.start_time = datetime.now()
         self.success = False
         self.error_message = None
+        self._smtp = None  # Återanvänd SMTP-anslutning mellan notifieringar
+        self._smtp_lås = threading.Lock()
+    
+    def _hämta_smtp(self):
+        """Returnerar en inloggad SMTP-anslutning, ny om den gamla inte svarar"""
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+                return self._smtp
+            except (smtplib.SMTPException, OSError):
+                self._smtp = None
+        
+        server = smtplib.SMTP(
+            self.email_config.get('smtp_server'),
+            self.email_config.get('smtp_port', 587)
+        )
+        server.starttls()
+        server.login(
+            self.email_config.get('username'),
+            self.email_config.get('password')
+        )
+        self._smtp = server
+        return server
+    
+    def close(self):
+        """Stänger SMTP-anslutningen om den är öppen"""
+        with self._smtp_lås:
+            if self._smtp is not None:
+                try:
+                    self._smtp.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self._smtp = None
         
     def send_email_notification(self, subject, message):
         """Skickar e-postnotifiering"""
@@ -60,23 +98,22 @@ class ScheduledRunner:
             
             msg.attach(MIMEText(message, 'plain'))
             
-            server = smtplib.SMTP(
-                self.email_config.get('smtp_server'),
-                self.email_config.get('smtp_port', 587)
-            )
-            server.starttls()
-            server.login(
-                self.email_config.get('username'),
-                self.email_config.get('password')
-            )
-            
             text = msg.as_string()
-            server.sendmail(
-                self.email_config.get('from_email'),
-                self.email_config.get('to_email'),
-                text
-            )
-            server.quit()
+            with self._smtp_lås:
+                try:
+                    self._hämta_smtp().sendmail(
+                        self.email_config.get('from_email'),
+                        self.email_config.get('to_email'),
+                        text
+                    )
+                except smtplib.SMTPServerDisconnected:
+                    # Servern stängde anslutningen mellan noop och sendmail, försök en gång till
+                    self._smtp = None
+                    self._hämta_smtp().sendmail(
+                        self.email_config.get('from_email'),
+                        self.email_config.get('to_email'),
+                        text
+                    )
             
             logger.info("E-postnotifiering skickad")
         except Exception as e:
@@ -102,8 +139,8 @@ class ScheduledRunner:
                 )
                 return
             
-            # Räkna PDF-filer före bearbetning
-            pdf_filer = list(sorterare.input_mapp.glob("*.pdf"))
+            # Räkna PDF-filer före bearbetning (en scandir-passage som återanvänds vid bearbetningen)
+            pdf_filer = sorterare.hitta_pdf_filer()
             logger.info(f"Hittade {len(pdf_filer)} PDF-filer att bearbeta")
             
             if not pdf_filer:
@@ -115,7 +152,7 @@ class ScheduledRunner:
                 return
             
             # Bearbeta alla PDF-filer
-            sorterare.bearbeta_alla_pdf()
+            sorterare.bearbeta_alla_pdf(pdf_filer)
             
             # Kontrollera resultat
             self.success = True
@@ -177,13 +214,17 @@ Loggfil: {log_file}
         """Rensar upp efter körning"""
         try:
             # Ta bort gamla loggfiler (äldre än 30 dagar)
-            log_dir = Path(".")
-            for log_file in log_dir.glob("scheduled_run_*.log"):
-                if log_file.stat().st_mtime < (datetime.now().timestamp() - 30 * 24 * 3600):
-                    log_file.unlink()
-                    logger.info(f"Tog bort gammal loggfil: {log_file}")
+            gräns = datetime.now().timestamp() - 30 * 24 * 3600
+            with os.scandir(".") as poster:
+                for post in poster:
+                    if (post.name.startswith("scheduled_run_") and post.name.endswith(".log")
+                            and post.stat().st_mtime < gräns):
+                        os.unlink(post.path)
+                        logger.info(f"Tog bort gammal loggfil: {post.name}")
         except Exception as e:
             logger.warning(f"Kunde inte rensa gamla loggfiler: {e}")
+        finally:
+            self.close()
 
 
 def main():
@@ -212,6 +253,10 @@ def main():
         runner.run()
     finally:
         runner.cleanup()
+        # Töm loggkön och skriv kvarvarande poster till körningens loggfil
+        _log_lyssnare.stop()
+        for handler in _log_lyssnare.handlers:
+            handler.flush()
     
     # Returnera exit-kod baserat på framgång
     return 0 if runner.success else 1
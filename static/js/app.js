@@ -178,13 +178,14 @@ function loadResultat() {
         });
 }
 
-// Visa resultat
-function showResultat(data) {
+// Visa resultat, ett block per bearbetad fil
+function showResultat(resultat) {
     const resultatSection = document.getElementById('resultat-section');
     const resultatContent = document.getElementById('resultat-content');
+    const lista = Array.isArray(resultat) ? resultat : [resultat];
     
-    let html = `
-        <div class="row">
+    let html = lista.map(data => `
+        <div class="row mb-3">
             <div class="col-md-6">
                 <h6>Filinformation</h6>
                 <p><strong>Filnamn:</strong> ${data.filnamn}</p>
@@ -204,6 +205,9 @@ function showResultat(data) {
                 <p><strong>Mål-mapp:</strong> ${data.mål_mapp}</p>
             </div>
         </div>
+    `).join('<hr>');
+    
+    html += `
         <div class="mt-3">
             <button class="btn btn-primary" onclick="loadStatistik()">
                 <i class="fas fa-sync-alt me-2"></i>Uppdatera statistik
@@ -1207,24 +1211,17 @@ function initSocket() {
         }
     });
     
-    socket.on('status_update', function(data) {
-        console.log('Status uppdatering:', data);
-        updateProgress(data.progress, data.meddelande);
-        
-        if (data.status === 'slutförd') {
-            showToast(`Bearbetning av ${data.fil} slutförd`, 'success');
-            setTimeout(() => {
-                loadStatistik();
-                laddaOsakertRemisser();
-            }, 1000);
-        } else if (data.status === 'fel') {
-            showToast(`Fel vid bearbetning av ${data.fil}: ${data.meddelande}`, 'error');
-        }
+    socket.on('status_update', handleStatusUpdate);
+    
+    // Servern samlar statusuppdateringar och skickar dem i batchar
+    socket.on('status_batch', function(batch) {
+        batch.forEach(handleStatusUpdate);
     });
     
+    // Filerna i en uppladdning blir klara var för sig; hämta sessionens alla resultat
     socket.on('bearbetning_slutförd', function(data) {
         console.log('Bearbetning slutförd:', data);
-        showResultat(data);
+        loadResultat();
     });
     
     socket.on('bearbetning_fel', function(data) {
@@ -1232,12 +1229,38 @@ function initSocket() {
         showToast(`Fel vid bearbetning av ${data.filnamn}: ${data.fel}`, 'error');
     });
     
+    // ML-modellen tränas om i bakgrunden när en verksamhet lagts till
+    socket.on('ml_träning_klar', function(data) {
+        if (data.success) {
+            showToast('ML-modellen är omtränad', 'success');
+        } else {
+            showToast(`Kunde inte träna om ML-modellen: ${data.error}`, 'warning');
+        }
+    });
+    
     socket.on('disconnect', function() {
         console.log('Frånkopplad från servern');
         showToast('Frånkopplad från servern', 'warning');
     });
 }
 
+// Hantera en statusuppdatering från servern
+function handleStatusUpdate(data) {
+    console.log('Status uppdatering:', data);
+    updateProgress(data.progress, data.meddelande);
+    
+    if (data.status === 'slutförd') {
+        const filer = data.antal_filer > 1 ? `${data.antal_filer} filer` : data.fil;
+        showToast(`Bearbetning av ${filer} slutförd`, 'success');
+        setTimeout(() => {
+            loadStatistik();
+            laddaOsakertRemisser();
+        }, 1000);
+    } else if (data.status === 'fel') {
+        showToast(`Fel vid bearbetning av ${data.fil}: ${data.meddelande}`, 'error');
+    }
+}
+
 // Visa toast-meddelande
 function showToast(message, type = 'info') {
     const toast = document.getElementById('toast');
@@ -4,18 +4,26 @@ Testskript för Remissorterare
 Verifierar att alla komponenter fungerar korrekt
 """
 
+import importlib.util
 import os
+import shutil
 import sys
 import logging
 from pathlib import Path
 from unittest.mock import Mock, patch
 
+import numpy as np
+from PIL import Image
+
 # Lägg till projektmappen i Python-sökvägen
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from remiss_sorterare import RemissSorterare
 from config import *
 
+# Enkel testbild med slumpbrus, skapas en gång (os.urandom är ett enda systemanrop)
+_TEST_BILD = Image.fromarray(np.frombuffer(os.urandom(100 * 100 * 3), dtype=np.uint8).reshape(100, 100, 3))
+
 def test_konfiguration():
     """Testar att konfigurationen är korrekt"""
     print("🔧 Testar konfiguration...")
@@ -53,7 +61,6 @@ def test_mappskapande():
     print("✅ Alla mappar skapades korrekt")
     
     # Rensa upp
-    import shutil
     if sorterare.input_mapp.exists():
         shutil.rmtree(sorterare.input_mapp)
     if sorterare.output_mapp.exists():
@@ -74,6 +81,7 @@ def test_personnummer_identifiering():
         ("Inget personnummer här", None),
         ("Falskt nummer 12345-6789", None),
         ("Korrekt: 20000101-0001", "20000101-0001"),
+        ("Tel 19850415-1234, pnr 19811218-9876", "19811218-9876"),
     ]
     
     for text, expected in test_cases:
@@ -97,6 +105,7 @@ def test_datum_identifiering():
         ("Remissdatum: 15/01/2024", "2024-01-15"),
         ("Datum: 2024-01-15", "2024-01-15"),
         ("Skapad: 15.01.24", "2024-01-15"),
+        ("Remiss 2024-03-01, svar senast 15/04/2024", "2024-03-01"),
         ("Inget datum här", None),
         ("Felaktigt datum: 32/13/2024", None),
     ]
@@ -111,6 +120,40 @@ def test_datum_identifiering():
     
     return True
 
+def test_förkompilerade_mönster():
+    """Testar att de förkompilerade regex-mönstren används och att inga mönster kompileras vid varje anrop"""
+    print("\n🔁 Testar förkompilerade regex-mönster...")
+    
+    import re
+    import remiss_sorterare
+    
+    sorterare = RemissSorterare()
+    datum_re = Mock(wraps=remiss_sorterare._DATUM_RE)
+    personnummer_re = Mock(wraps=remiss_sorterare._PERSONNUMMER_RE)
+    
+    # re.search/re.findall med strängmönster går via re._compile, inte re.compile
+    with patch.object(remiss_sorterare, '_DATUM_RE', datum_re), \
+         patch.object(remiss_sorterare, '_PERSONNUMMER_RE', personnummer_re), \
+         patch('re._compile', wraps=re._compile) as mock_compile:
+        for _ in range(3):
+            personnummer = sorterare.hitta_personnummer("Patient: 19850415-1234")
+            datum = sorterare.hitta_remissdatum("Remissdatum: 2024-01-15")
+    
+    if mock_compile.called:
+        print(f"❌ re._compile anropades {mock_compile.call_count} gånger vid sökning")
+        return False
+    
+    if not personnummer_re.finditer.called or not datum_re.finditer.called:
+        print("❌ De förkompilerade mönstren _PERSONNUMMER_RE/_DATUM_RE användes inte")
+        return False
+    
+    if personnummer != "19850415-1234" or datum != "2024-01-15":
+        print(f"❌ Fel resultat: {personnummer}, {datum}")
+        return False
+    
+    print("✅ Förkompilerade mönster används och inga mönster kompileras vid sökning")
+    return True
+
 def test_verksamhet_identifiering():
     """Testar verksamhetsidentifiering"""
     print("\n🏥 Testar verksamhetsidentifiering...")
@@ -141,15 +184,8 @@ def test_bildforbattring():
     
     sorterare = RemissSorterare()
     
-    # Skapa en mock-bild
-    from PIL import Image
-    import numpy as np
-    
-    # Skapa en enkel testbild
-    test_bild = Image.fromarray(np.random.randint(0, 255, (100, 100, 3), dtype=np.uint8))
-    
     try:
-        forbattrad_bild = sorterare.forbattra_bild_for_ocr(test_bild)
+        forbattrad_bild = sorterare.forbattra_bild_for_ocr(_TEST_BILD.copy())
         assert forbattrad_bild is not None
         print("✅ Bildförbättring fungerar")
         return True
@@ -191,7 +227,6 @@ def test_dat_fil_skapande():
         
         # Rensa upp
         dat_fil.unlink()
-        import shutil
         shutil.rmtree(sorterare.input_mapp)
         shutil.rmtree(sorterare.output_mapp)
         
@@ -213,11 +248,11 @@ def test_beroenden():
         'dateutil'
     ]
     
+    # find_spec letar upp paketet utan att köra dess modulkod
     for package in required_packages:
-        try:
-            __import__(package)
+        if importlib.util.find_spec(package) is not None:
             print(f"✅ {package} är installerat")
-        except ImportError:
+        else:
             print(f"❌ {package} saknas")
             return False
     
@@ -233,6 +268,7 @@ def main():
         test_mappskapande,
         test_personnummer_identifiering,
         test_datum_identifiering,
+        test_förkompilerade_mönster,
         test_verksamhet_identifiering,
         test_bildforbattring,
         test_dat_fil_skapande,
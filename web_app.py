@@ -5,21 +5,57 @@ Flask-app med drag-and-drop, realtidsstatus och resultatvisning
 """
 
 import os
+import queue
+import re
+import shutil
 import sys
+import tempfile
+import hashlib
 import json
 import logging
 import threading
 import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from werkzeug.utils import secure_filename
-from flask import Flask, render_template, request, jsonify, send_from_directory, send_file
+from flask import Flask, Request, render_template, request, jsonify, send_from_directory, send_file
+from flask.json.provider import DefaultJSONProvider
 from flask_socketio import SocketIO, emit, join_room
 import uuid
 
-from remiss_sorterare import RemissSorterare
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+try:
+    from flask_compress import Compress
+    COMPRESS_AVAILABLE = True
+except ImportError:
+    COMPRESS_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+from remiss_sorterare import RemissSorterare, _initiera_läsprocess, _extrahera_text_i_process, _värm_upp_läsprocess
 from ml_verksamhetsidentifierare import MLVerksamhetsIdentifierare
+import config
 from config import *
 
 # Kontrollera att virtuell miljö är aktiverad
@@ -76,93 +112,738 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = 'remissorterare-secret-key-2024'
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max
+# Bakom en omvänd proxy skickas filerna av proxyn i stället för att strömmas genom Python
+app.config['USE_X_SENDFILE'] = WEB_X_SENDFILE
+UPLOAD_BUFFERT = 1 << 20  # 1 MiB per skrivning vid lagring av uppladdade filer
+UPLOAD_SPOLGRÄNS = 500 * 1024  # Större förfrågningar spolas till disk, mindre hålls i minnet
+
+class UppladdningsRequest(Request):
+    """
+    Request som spolar stora uppladdade filer till upload-mappen i stället för /tmp
+    
+    Spolfilen ligger då på samma filsystem som session-mappen och kan hårdlänkas
+    dit, så att filen bara skrivs till disk en gång.
+    """
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is None or total_content_length > UPLOAD_SPOLGRÄNS:
+            return tempfile.NamedTemporaryFile('wb+', dir=app.config['UPLOAD_FOLDER'], suffix='.part')
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+app.request_class = UppladdningsRequest
+
+# Komprimera svar (gzip/brotli) om Flask-Compress finns
+if COMPRESS_AVAILABLE:
+    Compress(app)
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    JSON-provider som serialiserar med orjson i stället för json i standardbiblioteket
+    
+    Datum och andra typer som Flask omvandlar själv går via Flasks default-funktion,
+    så svaren blir desamma som tidigare. Objekt som orjson inte klarar (t.ex.
+    numpy-tal) serialiseras med standardbiblioteket som förut.
+    """
+    
+    def _orjson_dumps(self, obj, indentera: bool = False) -> Optional[bytes]:
+        flaggor = orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            flaggor |= orjson.OPT_SORT_KEYS
+        if indentera:
+            flaggor |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=self.default, option=flaggor)
+        except TypeError:
+            return None
+    
+    def dumps(self, obj, **kwargs) -> str:
+        data = None if kwargs else self._orjson_dumps(obj)
+        if data is None:
+            return super().dumps(obj, **kwargs)
+        return data.decode()
+    
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indentera = (self.compact is None and self._app.debug) or self.compact is False
+        data = self._orjson_dumps(obj, indentera)
+        if data is None:
+            return super().response(obj)
+        return self._app.response_class(data + b"\n", mimetype=self.mimetype)
+
+class ORJSONSocketIO:
+    """
+    JSON-modul för Socket.IO-paketen som serialiserar med orjson
+    
+    Paket som orjson inte klarar serialiseras med standardbiblioteket som förut.
+    """
+    
+    @staticmethod
+    def dumps(obj, **kwargs) -> str:
+        try:
+            return orjson.dumps(obj).decode()
+        except TypeError:
+            return json.dumps(obj, **kwargs)
+    
+    @staticmethod
+    def loads(s, **kwargs):
+        return orjson.loads(s)
+
+if ORJSON_AVAILABLE:
+    app.json = ORJSONProvider(app)
+
+def spara_uppladdning_med_länk(ström, file_path: Path) -> bool:
+    """
+    Hårdlänkar en spolad uppladdning till sin plats i session-mappen
+    
+    Args:
+        ström: Filströmmen från Werkzeug
+        file_path: Sökväg där filen ska sparas
+        
+    Returns:
+        True om filen länkades, False om den måste kopieras (t.ex. liten fil i minnet)
+    """
+    spolfil = getattr(ström, 'name', None)
+    if not isinstance(spolfil, str):
+        return False
+    try:
+        ström.flush()
+        os.link(spolfil, file_path)
+        return True
+    except OSError:
+        return False
 
 # Konfigurera SocketIO för realtidskommunikation
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Med Redis går händelserna via Redis pub/sub, så att flera webbprocesser kan dela klienter
+# Med orjson serialiseras även Socket.IO-paketen med den
+socketio_json = {'json': ORJSONSocketIO} if ORJSON_AVAILABLE else {}
+if REDIS_URL and REDIS_AVAILABLE:
+    socketio = SocketIO(app, cors_allowed_origins="*", message_queue=REDIS_URL, **socketio_json)
+else:
+    socketio = SocketIO(app, cors_allowed_origins="*", **socketio_json)
 
 # Skapa nödvändiga mappar
-Path(app.config['UPLOAD_FOLDER']).mkdir(exist_ok=True)
-Path('static/uploads').mkdir(exist_ok=True)
+for mapp in (app.config['UPLOAD_FOLDER'], 'static/uploads'):
+    if not os.path.isdir(mapp):
+        os.makedirs(mapp, exist_ok=True)
+
+def rensa_ocr_cache():
+    """
+    Tar bort OCR-cachefiler som inte använts på OCR_CACHE_TTL sekunder, och därefter
+    de minst nyligen använda tills cachen ryms inom OCR_CACHE_MAX_STORLEK
+    """
+    gräns = time.time() - OCR_CACHE_TTL
+    filer = []
+    try:
+        with os.scandir(OCR_CACHE_MAPP) as poster:
+            for post in poster:
+                try:
+                    stat = post.stat()
+                except FileNotFoundError:
+                    continue
+                filer.append((stat.st_mtime, stat.st_size, post.path))
+    except FileNotFoundError:
+        return
+    
+    filer.sort()
+    total = sum(storlek for _, storlek, _ in filer)
+    for mtime, storlek, sökväg in filer:
+        if mtime >= gräns and total <= OCR_CACHE_MAX_STORLEK:
+            break
+        try:
+            os.unlink(sökväg)
+        except FileNotFoundError:
+            pass
+        total -= storlek
+
+# OCR-texten innehåller personnummer, så cachemappen är bara läsbar för serverns användare
+os.makedirs(OCR_CACHE_MAPP, mode=0o700, exist_ok=True)
+os.chmod(OCR_CACHE_MAPP, 0o700)
+rensa_ocr_cache()
+
+# Output-mappen löses upp en gång; sökvägar från förfrågningar normaliseras mot den
+OUTPUT_ROT = Path(OUTPUT_MAPP).resolve()
+OSAKERT_SÖKVÄG = OUTPUT_ROT / OSAKERT_MAPP
+
+def _output_sökväg(verksamhet: str, filnamn: Optional[str] = None) -> Optional[Path]:
+    """
+    Bygger sökvägen till en verksamhetsmapp, eller en fil i den, under output-mappen
+    
+    Args:
+        verksamhet: Verksamhetens mappnamn
+        filnamn: Filnamn i verksamhetsmappen (valfritt)
+        
+    Returns:
+        Sökvägen, eller None om den inte ligger direkt i output-mappen respektive verksamhetsmappen
+    """
+    mapp = Path(os.path.normpath(OUTPUT_ROT / verksamhet))
+    if mapp.parent != OUTPUT_ROT:
+        return None
+    if filnamn is None:
+        return mapp
+    fil = Path(os.path.normpath(mapp / filnamn))
+    return fil if fil.parent == mapp else None
+
+class SessionLagring:
+    """Trådsäker dict med begränsad storlek (LRU) och tidsgräns per session"""
+    
+    def __init__(self, max_antal: int = WEB_SESSION_MAX_ANTAL, ttl: float = WEB_SESSION_TTL):
+        self.max_antal = max_antal
+        self.ttl = ttl
+        self._data = OrderedDict()  # session_id -> (tidpunkt, värde), äldst först
+        self._lås = threading.Lock()
+    
+    def _rensa(self, nu: float):
+        """Tar bort utgångna och överflödiga poster från den äldsta änden"""
+        while self._data:
+            session_id, (tidpunkt, _) = next(iter(self._data.items()))
+            if nu - tidpunkt <= self.ttl and len(self._data) <= self.max_antal:
+                break
+            del self._data[session_id]
+    
+    def __setitem__(self, session_id, värde):
+        nu = time.monotonic()
+        with self._lås:
+            self._data[session_id] = (nu, värde)
+            self._data.move_to_end(session_id)
+            self._rensa(nu)
+    
+    def get(self, session_id, standard=None):
+        with self._lås:
+            post = self._data.get(session_id)
+            if post is None:
+                return standard
+            if time.monotonic() - post[0] > self.ttl:
+                del self._data[session_id]
+                return standard
+            return post[1]
+    
+    def __getitem__(self, session_id):
+        värde = self.get(session_id, self)
+        if värde is self:
+            raise KeyError(session_id)
+        return värde
+    
+    def __contains__(self, session_id) -> bool:
+        return self.get(session_id, self) is not self
+
+class RedisSessionLagring(SessionLagring):
+    """SessionLagring i Redis, delad mellan webbprocesser; Redis sköter tidsgränsen"""
+    
+    def __init__(self, klient, prefix: str, ttl: float = WEB_SESSION_TTL):
+        self._klient = klient
+        self._prefix = prefix
+        self.ttl = int(ttl)
+    
+    def __setitem__(self, session_id, värde):
+        self._klient.set(f"{self._prefix}:{session_id}", json.dumps(värde), ex=self.ttl)
+    
+    def get(self, session_id, standard=None):
+        data = self._klient.get(f"{self._prefix}:{session_id}")
+        return standard if data is None else json.loads(data)
 
 # Globala variabler för att hålla koll på bearbetningsstatus
-bearbetnings_status = {}
-bearbetnings_resultat = {}
+if REDIS_URL and REDIS_AVAILABLE:
+    _redis_klient = redis.Redis.from_url(REDIS_URL)
+    bearbetnings_status = RedisSessionLagring(_redis_klient, 'status')
+    bearbetnings_resultat = RedisSessionLagring(_redis_klient, 'resultat')
+else:
+    bearbetnings_status = SessionLagring()
+    bearbetnings_resultat = SessionLagring()
+
+# Filerna i en uppladdning bearbetas parallellt av arbetartrådarna. Sessionens status och
+# resultatlista läses, ändras och skrivs under låset, och sparas alltid som nya objekt så
+# att en samtidig läsning aldrig ser en halvt uppdaterad dict.
+_session_lås = threading.Lock()
+_KLARA_FILSTATUSAR = ('slutförd', 'fel')
+
+def initiera_sessionsstatus(session_id: str, filnamn: List[str]):
+    """
+    Sparar startstatus för en uppladdning med alla dess filer som väntande
+    
+    Args:
+        session_id: Unikt ID för sessionen
+        filnamn: Namnen på filerna i uppladdningen
+    """
+    filer = {namn: {'status': 'väntar', 'progress': 0, 'meddelande': 'Väntar på bearbetning...'}
+             for namn in filnamn}
+    with _session_lås:
+        bearbetnings_status[session_id] = _samla_sessionsstatus(filer, None)
+
+def _samla_sessionsstatus(filer: Dict[str, Dict], filnamn: Optional[str]) -> Dict:
+    """
+    Räknar fram sessionens samlade status från filernas status
+    
+    Args:
+        filer: Status per filnamn
+        filnamn: Filen som senast uppdaterades, eller None
+        
+    Returns:
+        Sessionens status; 'bearbetar' tills alla filer är klara, progress är medelvärdet
+        över filerna och meddelandet kommer från den senast uppdaterade filen
+    """
+    klara = sum(fil['status'] in _KLARA_FILSTATUSAR for fil in filer.values())
+    fel = sum(fil['status'] == 'fel' for fil in filer.values())
+    if klara < len(filer):
+        status = 'bearbetar'
+        progress = sum(100 if fil['status'] in _KLARA_FILSTATUSAR else fil['progress']
+                       for fil in filer.values()) // len(filer)
+    else:
+        status = 'fel' if fel == len(filer) else 'slutförd'
+        progress = 0 if status == 'fel' else 100
+    
+    if filnamn is None:
+        meddelande = 'Väntar på bearbetning...'
+    elif len(filer) == 1:
+        meddelande = filer[filnamn]['meddelande']
+    else:
+        meddelande = f"{filnamn}: {filer[filnamn]['meddelande']} ({klara}/{len(filer)} klara)"
+    
+    return {
+        'status': status,
+        'fil': filnamn,
+        'progress': progress,
+        'meddelande': meddelande,
+        'antal_filer': len(filer),
+        'klara': klara,
+        'fel': fel,
+        'filer': filer,
+        'timestamp': datetime.now().isoformat()
+    }
+
+def uppdatera_filstatus(session_id: str, filnamn: str, **fält) -> Dict:
+    """
+    Uppdaterar en fils status och räknar om sessionens samlade status
+    
+    Args:
+        session_id: Unikt ID för sessionen
+        filnamn: Filen som uppdateras
+        **fält: Filens nya status, progress och/eller meddelande
+        
+    Returns:
+        Sessionens samlade status utan status per fil, att skicka till klienten
+    """
+    with _session_lås:
+        tidigare = bearbetnings_status.get(session_id) or {}
+        filer = {namn: dict(fil) for namn, fil in tidigare.get('filer', {}).items()}
+        fil = filer.setdefault(filnamn, {'status': 'väntar', 'progress': 0, 'meddelande': ''})
+        fil.update(fält)
+        tillstånd = _samla_sessionsstatus(filer, filnamn)
+        bearbetnings_status[session_id] = tillstånd
+    return {nyckel: värde for nyckel, värde in tillstånd.items() if nyckel != 'filer'}
+
+def lägg_till_resultat(session_id: str, resultat: Dict):
+    """
+    Lägger en fils resultat till sessionens resultatlista
+    
+    Args:
+        session_id: Unikt ID för sessionen
+        resultat: Resultatet för filen
+    """
+    with _session_lås:
+        bearbetnings_resultat[session_id] = list(bearbetnings_resultat.get(session_id) or []) + [resultat]
+
+# Händelser till klienten köas per session och skickas av en bakgrundsuppgift, så att
+# arbetartrådarna aldrig väntar på WebSocket-sändningar. Statusuppdateringar skickas
+# som en batch för att minska antalet WebSocket-ramar.
+STATUS_BATCH_INTERVALL = 0.1  # sekunder
+väntande_händelser = defaultdict(deque)  # session_id -> (händelse, data)
+_status_lås = threading.Lock()
+_status_sändare_startad = False
 
 # Konfigurera logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def köa_händelse(session_id: str, händelse: str, data: Dict):
+    """
+    Lägger en SocketIO-händelse i sessionens kö
+    
+    Args:
+        session_id: Unikt ID för sessionen
+        händelse: Händelsens namn, t.ex. 'bearbetning_slutförd'
+        data: Data som skickas med händelsen
+    """
+    global _status_sändare_startad
+    with _status_lås:
+        väntande_händelser[session_id].append((händelse, data))
+        if not _status_sändare_startad:
+            _status_sändare_startad = True
+            socketio.start_background_task(_skicka_händelser)
+
+def köa_status(session_id: str, uppdatering: Dict):
+    """
+    Lägger en statusuppdatering i kön för nästa statusbatch
+    
+    Args:
+        session_id: Unikt ID för sessionen
+        uppdatering: Fälten som ska skickas, t.ex. bara progress och meddelande
+    """
+    köa_händelse(session_id, 'status_update', uppdatering)
+
+def skicka_väntande_händelser(session_id: str):
+    """
+    Skickar köade händelser för en session i den ordning de köades
+    
+    Statusuppdateringar i följd slås ihop till en status_batch.
+    
+    Args:
+        session_id: Unikt ID för sessionen
+    """
+    with _status_lås:
+        poster = list(väntande_händelser.pop(session_id, ()))
+    
+    batch = []
+    for händelse, data in poster:
+        if händelse == 'status_update':
+            batch.append(data)
+            continue
+        if batch:
+            socketio.emit('status_batch', batch, room=session_id)
+            batch = []
+        socketio.emit(händelse, data, room=session_id)
+    if batch:
+        socketio.emit('status_batch', batch, room=session_id)
+
+def _skicka_händelser():
+    """Bakgrundsuppgift som skickar köade händelser med jämna mellanrum"""
+    while True:
+        socketio.sleep(STATUS_BATCH_INTERVALL)
+        with _status_lås:
+            sessioner = list(väntande_händelser)
+        for session_id in sessioner:
+            skicka_väntande_händelser(session_id)
+
+# Processpool för rendering och OCR, skapas vid första uppladdningen och delas av alla förfrågningar.
+# Varje process har en egen RemissSorterare med färdigladdade OCR-instanser.
+_ocr_pool: Optional[ProcessPoolExecutor] = None
+_ocr_pool_lås = threading.Lock()
+
+def hämta_ocr_pool() -> ProcessPoolExecutor:
+    """Returnerar den gemensamma processpoolen för OCR, skapar den vid behov"""
+    global _ocr_pool
+    with _ocr_pool_lås:
+        if _ocr_pool is None:
+            _ocr_pool = ProcessPoolExecutor(
+                max_workers=WEB_OCR_PROCESSER,
+                initializer=_initiera_läsprocess,
+                initargs=(WEB_OCR_PROCESSER,)
+            )
+        return _ocr_pool
+
+def värm_upp_ocr_pool():
+    """Startar alla processer i OCR-poolen och laddar tessdata i dem i förväg"""
+    try:
+        pool = hämta_ocr_pool()
+        # Ett jobb per process så att poolen startar alla processer direkt
+        jobb = [pool.submit(_värm_upp_läsprocess) for _ in range(WEB_OCR_PROCESSER)]
+        processer = {j.result() for j in jobb}
+        logger.info(f"OCR-poolen uppvärmd ({len(processer)} processer)")
+    except Exception as e:
+        logger.warning(f"Uppvärmning av OCR-poolen misslyckades: {e}")
+
 class WebRemissSorterare:
     """Web-vänlig version av Remissorterare"""
     
     def __init__(self):
         self.sorterare = RemissSorterare()
         self.ml_identifierare = MLVerksamhetsIdentifierare()
+        # Instansen delas av alla förfrågningar; låset skyddar det som ändrar modellerna
+        self.lås = threading.RLock()
+        # Identifieringsresultat per (modellversion, texthash) (LRU). Versionen räknas upp när
+        # cachen töms, så att ett resultat från före bytet aldrig sparas efter tömningen.
+        self._identifiering_cache = OrderedDict()
+        self._modellversion = 0
+        # Extraherad text per (sökväg, mtime, storlek) (LRU), sparar hashning av filen vid upprepade anrop
+        self._text_cache = OrderedDict()
     
-    def bearbeta_fil_web(self, fil_sokvag: Path, session_id: str) -> Dict:
+    def identifiera_verksamhet(self, text: str) -> Tuple[str, float]:
         """
-        Bearbetar en fil och returnerar resultat för web-gränssnittet
+        Identifierar verksamhet med cache för texter som redan analyserats
         
         Args:
-            fil_sokvag: Sökväg till filen
-            session_id: Unikt ID för sessionen
+            text: Text att analysera
             
         Returns:
-            Dictionary med resultat
+            Tuple med (verksamhet, sannolikhet)
         """
-        try:
-            # Uppdatera status
-            bearbetnings_status[session_id] = {
-                'status': 'bearbetar',
-                'fil': fil_sokvag.name,
-                'progress': 0,
-                'meddelande': 'Startar bearbetning...',
-                'timestamp': datetime.now().isoformat()
+        texthash = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        with self.lås:
+            nyckel = (self._modellversion, texthash)
+            resultat = self._identifiering_cache.get(nyckel)
+            if resultat is not None:
+                self._identifiering_cache.move_to_end(nyckel)
+                return resultat
+        
+        resultat = self.sorterare.identifiera_verksamhet(text)
+        with self.lås:
+            # Har cachen tömts under tiden beräknades resultatet med en gammal modell
+            if nyckel[0] == self._modellversion:
+                self._identifiering_cache[nyckel] = resultat
+                if len(self._identifiering_cache) > IDENTIFIERING_CACHE_STORLEK:
+                    self._identifiering_cache.popitem(last=False)
+        return resultat
+    
+    def ai_identifiera(self, text: str) -> Tuple[str, float]:
+        """
+        Identifierar verksamhet med enbart AI-identifieraren, med cache per text
+        
+        Args:
+            text: Text att analysera
+            
+        Returns:
+            Tuple med (verksamhet, sannolikhet)
+        """
+        return self.sorterare.ai_identifiera(text)
+    
+    def rensa_identifieringscache(self):
+        """Tömmer cachade identifierings- och AI-resultat, anropas när en modell tränats om eller bytts"""
+        with self.lås:
+            self._modellversion += 1
+            self._identifiering_cache.clear()
+            self.sorterare.rensa_ai_cache()
+    
+    def träna_ml(self) -> float:
+        """
+        Tränar om ML-modellen på verksamheterna i config
+        
+        Träningen görs på en ny pipeline utan att hålla låset, så att identifiering
+        och uppladdningar fortsätter under tiden. Låset tas bara för att byta in
+        modellen och tömma cachen.
+        
+        Returns:
+            Precision på testdatan
+        """
+        pipeline, accuracy = self.ml_identifierare.träna_pipeline()
+        with self.lås:
+            self.ml_identifierare.byt_pipeline(pipeline)
+            self.rensa_identifieringscache()
+        self.ml_identifierare.spara_modell()
+        return accuracy
+    
+    def träna_ml_med_omfördelningsdata(self, omfördelningsdata: List[Tuple[str, str]]) -> int:
+        """
+        Tränar sorterarens ML-modell med data från manuella omfördelningar
+        
+        Texterna hämtas via OCR-cachen och processpoolen, och låset tas bara
+        för att byta in den nytränade modellen.
+        
+        Args:
+            omfördelningsdata: Lista med (pdf_namn, rätt_verksamhet) tuples
+            
+        Returns:
+            Antal remisser som användes i träningen
+        """
+        texter = []
+        verksamheter = []
+        for pdf_namn, rätt_verksamhet in omfördelningsdata:
+            pdf_sokvag = _output_sökväg(rätt_verksamhet, pdf_namn)
+            if pdf_sokvag is None or not pdf_sokvag.exists():
+                continue
+            text = self.extrahera_text(pdf_sokvag)
+            if text.strip():
+                texter.append(text)
+                verksamheter.append(rätt_verksamhet)
+                logger.info(f"Lade till träningsdata: {pdf_namn} -> {rätt_verksamhet}")
+        
+        if not texter:
+            logger.warning("Ingen text kunde extraheras från omfördelningsdata")
+            return 0
+        
+        ml_identifierare = self.sorterare.ml_identifierare
+        pipeline = ml_identifierare.träna_anpassad_pipeline(texter, verksamheter)
+        with self.lås:
+            ml_identifierare.byt_pipeline(pipeline)
+            self.rensa_identifieringscache()
+        ml_identifierare.spara_modell()
+        logger.info("ML-modell tränad med omfördelningsdata")
+        return len(texter)
+    
+    def byt_ollama_modell(self, modell: str) -> bool:
+        """
+        Byter Ollama-modell i den befintliga AI-identifieraren
+        
+        Bara AI-identifieraren påverkas, ML-modellen och OCR laddas inte om.
+        
+        Args:
+            modell: Namn på Ollama-modellen
+            
+        Returns:
+            True om bytet lyckades
+        """
+        ai_identifierare = self.sorterare.ai_identifierare
+        if not hasattr(ai_identifierare, 'byt_ollama_modell'):
+            return False
+        with self.lås:
+            resultat = ai_identifierare.byt_ollama_modell(modell)
+            self.rensa_identifieringscache()
+        return resultat
+    
+    def cache_info(self) -> Dict:
+        """Returnerar hur många resultat som ligger i identifierings- och AI-cachen"""
+        with self.lås:
+            return {
+                'identifiering': len(self._identifiering_cache),
+                'ai': len(self.sorterare._ai_cache),
+                'max_storlek': IDENTIFIERING_CACHE_STORLEK
             }
-            socketio.emit('status_update', bearbetnings_status[session_id], room=session_id)
-            logger.info(f"Session {session_id}: Startar bearbetning av {fil_sokvag.name}")
+    
+    @staticmethod
+    def _ocr_cache_fil(fil_sokvag: Path) -> Path:
+        """Returnerar OCR-cachefilen för en PDF, nyckel är hash av filinnehållet"""
+        filhash = hashlib.blake2b(digest_size=20)
+        with open(fil_sokvag, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                filhash.update(block)
+        return Path(OCR_CACHE_MAPP) / f"{filhash.hexdigest()}.txt"
+    
+    @classmethod
+    def _läs_ocr_cache(cls, fil_sokvag: Path) -> Tuple[Path, Optional[str]]:
+        """
+        Slår upp OCR-text för en PDF i diskcachen
+        
+        Args:
+            fil_sokvag: Sökväg till filen
             
-            # Konvertera PDF till bilder
-            bearbetnings_status[session_id].update({
-                'progress': 20,
-                'meddelande': 'Konverterar PDF till bilder...'
-            })
-            socketio.emit('status_update', bearbetnings_status[session_id], room=session_id)
-            logger.info(f"Session {session_id}: Konverterar PDF till bilder")
+        Returns:
+            Tuple med (cachefil, text eller None om den inte finns i cachen eller har gått ut)
+        """
+        cache_fil = cls._ocr_cache_fil(fil_sokvag)
+        try:
+            if time.time() - cache_fil.stat().st_mtime > OCR_CACHE_TTL:
+                cache_fil.unlink(missing_ok=True)
+                return cache_fil, None
+            text = cache_fil.read_text(encoding='utf-8')
+            # mtime är senaste användning, rensningen tar bort de minst nyligen använda först
+            os.utime(cache_fil)
+        except FileNotFoundError:
+            return cache_fil, None
+        return cache_fil, text
+    
+    @staticmethod
+    def _skriv_ocr_cache(cache_fil: Path, text: str):
+        """Skriver OCR-text till diskcachen (läsbar bara för serverns användare) och rensar cachen"""
+        os.makedirs(cache_fil.parent, mode=0o700, exist_ok=True)
+        # Skriv till en temporär fil först så att en halvskriven cachefil aldrig läses
+        tmp_fil = cache_fil.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        fd = os.open(tmp_fil, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with open(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_fil, cache_fil)
+        rensa_ocr_cache()
+    
+    def glöm_text(self, fil_sokvag: Path, från_disk: bool = True):
+        """
+        Tar bort en PDF:s text från minnescachen och, om den raderas, från diskcachen
+        
+        Diskcachen har filinnehållet som nyckel och gäller även efter en flytt, så vid
+        flytt tas bara minnescachens poster för den gamla sökvägen bort.
+        
+        Args:
+            fil_sokvag: Sökväg till filen
+            från_disk: True när remissen raderas, False när den bara flyttas
+        """
+        if från_disk:
+            try:
+                self._ocr_cache_fil(fil_sokvag).unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Kunde inte ta bort OCR-cache för {fil_sokvag.name}: {e}")
+        sökväg = os.fspath(fil_sokvag)
+        with self.lås:
+            for nyckel in [nyckel for nyckel in self._text_cache if nyckel[0] == sökväg]:
+                del self._text_cache[nyckel]
+    
+    def extrahera_text(self, fil_sokvag: Path) -> str:
+        """
+        Renderar och OCR-läser en PDF i processpoolen
+        
+        Args:
+            fil_sokvag: Sökväg till filen
             
+        Returns:
+            Extraherad text
+        """
+        global _ocr_pool
+        stat = fil_sokvag.stat()
+        nyckel = (os.fspath(fil_sokvag), stat.st_mtime_ns, stat.st_size)
+        with self.lås:
+            text = self._text_cache.get(nyckel)
+            if text is not None:
+                self._text_cache.move_to_end(nyckel)
+                return text
+        
+        cache_fil, text = self._läs_ocr_cache(fil_sokvag)
+        if text is not None:
+            logger.info(f"OCR-text för {fil_sokvag.name} hämtad från cache")
+            self._spara_text_cache(nyckel, text)
+            return text
+        
+        try:
+            text = hämta_ocr_pool().submit(_extrahera_text_i_process, fil_sokvag).result()
+        except BrokenProcessPool as e:
+            logger.error(f"OCR-processpoolen kraschade, läser {fil_sokvag.name} i tråden: {e}")
+            with _ocr_pool_lås:
+                _ocr_pool = None
             bilder = self.sorterare.pdf_till_bilder(fil_sokvag)
             if not bilder:
                 raise Exception("Kunde inte konvertera PDF till bilder")
+            text = self.sorterare.extrahera_text_med_ocr(bilder, fil_sokvag)
+        
+        if text.strip():
+            self._skriv_ocr_cache(cache_fil, text)
+            self._spara_text_cache(nyckel, text)
+        return text
+    
+    def _spara_text_cache(self, nyckel: Tuple[str, int, int], text: str):
+        """Sparar extraherad text i minnescachen och tar bort den äldsta posten vid behov"""
+        with self.lås:
+            self._text_cache[nyckel] = text
+            self._text_cache.move_to_end(nyckel)
+            if len(self._text_cache) > OCR_TEXT_CACHE_STORLEK:
+                self._text_cache.popitem(last=False)
+    
+    def bearbeta_fil_web(self, fil_sokvag: Path, session_id: str) -> Dict:
+        """
+        Bearbetar en fil och returnerar resultat för web-gränssnittet
+        
+        Args:
+            fil_sokvag: Sökväg till filen
+            session_id: Unikt ID för sessionen
             
-            # OCR-bearbetning
-            bearbetnings_status[session_id].update({
-                'progress': 40,
-                'meddelande': 'Utför OCR-bearbetning...'
-            })
-            socketio.emit('status_update', bearbetnings_status[session_id], room=session_id)
-            logger.info(f"Session {session_id}: Utför OCR-bearbetning")
+        Returns:
+            Dictionary med resultat
+        """
+        filnamn = fil_sokvag.name
+        try:
+            # Filens status uppdateras i varje steg; sessionens samlade status skickas till klienten
+            köa_status(session_id, uppdatera_filstatus(
+                session_id, filnamn, status='bearbetar', progress=0, meddelande='Startar bearbetning...'))
+            logger.info(f"Session {session_id}: Startar bearbetning av {filnamn}")
             
-            text = self.sorterare.extrahera_text_med_ocr(bilder)
+            # Konvertera PDF till bilder och OCR-läs i processpoolen
+            köa_status(session_id, uppdatera_filstatus(
+                session_id, filnamn, progress=20, meddelande='Konverterar PDF och utför OCR-bearbetning...'))
+            logger.info(f"Session {session_id}: Konverterar PDF och utför OCR-bearbetning")
+            
+            text = self.extrahera_text(fil_sokvag)
             if not text.strip():
                 raise Exception("Ingen text kunde extraheras från PDF")
             
             # Identifiera verksamhet
-            bearbetnings_status[session_id].update({
-                'progress': 60,
-                'meddelande': 'Identifierar verksamhet...'
-            })
-            socketio.emit('status_update', bearbetnings_status[session_id], room=session_id)
+            köa_status(session_id, uppdatera_filstatus(
+                session_id, filnamn, progress=60, meddelande='Identifierar verksamhet...'))
             logger.info(f"Session {session_id}: Identifierar verksamhet")
             
-            verksamhet, sannolikhet = self.sorterare.identifiera_verksamhet(text)
+            verksamhet, sannolikhet = self.identifiera_verksamhet(text)
             logger.info(f"Session {session_id}: Verksamhet identifierad: {verksamhet} ({sannolikhet:.1f}%)")
             
             # Extrahera data
-            bearbetnings_status[session_id].update({
-                'progress': 80,
-                'meddelande': 'Extraherar data...'
-            })
-            socketio.emit('status_update', bearbetnings_status[session_id], room=session_id)
+            köa_status(session_id, uppdatera_filstatus(
+                session_id, filnamn, progress=80, meddelande='Extraherar data...'))
             logger.info(f"Session {session_id}: Extraherar data")
             
             personnummer = self.sorterare.hitta_personnummer(text)
@@ -181,11 +862,15 @@ class WebRemissSorterare:
             # Skapa mål-mapp om den inte finns
             mål_mapp.mkdir(parents=True, exist_ok=True)
             
-            # Kopiera fil
-            mål_fil = mål_mapp / fil_sokvag.name
-            import shutil
-            shutil.copy2(fil_sokvag, mål_fil)
-            logger.info(f"Session {session_id}: PDF kopierad till {mål_fil}")
+            # Flytta filen, uppladdningen behövs inte efter bearbetningen. Mellan
+            # filsystem görs istället hårdlänk eller kopia.
+            mål_mapp_sökväg = os.fspath(mål_mapp)
+            mål_fil = os.path.join(mål_mapp_sökväg, fil_sokvag.name)
+            try:
+                os.replace(fil_sokvag, mål_fil)
+            except OSError:
+                self.sorterare.kopiera_pdf(fil_sokvag, mål_fil)
+            logger.info(f"Session {session_id}: PDF placerad i {mål_fil}")
             
             # Skapa .dat-fil
             if personnummer:
@@ -196,13 +881,9 @@ class WebRemissSorterare:
                 logger.info(f"Session {session_id}: .dat-fil skapad")
             
             # Slutför
-            bearbetnings_status[session_id].update({
-                'progress': 100,
-                'meddelande': 'Bearbetning slutförd',
-                'status': 'slutförd'
-            })
-            socketio.emit('status_update', bearbetnings_status[session_id], room=session_id)
-            logger.info(f"Session {session_id}: Bearbetning slutförd")
+            köa_status(session_id, uppdatera_filstatus(
+                session_id, filnamn, status='slutförd', progress=100, meddelande='Bearbetning slutförd'))
+            logger.info(f"Session {session_id}: Bearbetning av {filnamn} slutförd")
             
             # Skapa resultat
             resultat = {
@@ -212,38 +893,70 @@ class WebRemissSorterare:
                 'personnummer': personnummer,
                 'remissdatum': remissdatum,
                 'status': status,
-                'mål_mapp': str(mål_mapp),
+                'mål_mapp': mål_mapp_sökväg,
                 'text_längd': len(text),
                 'bearbetningstid': datetime.now().isoformat()
             }
             
-            bearbetnings_resultat[session_id] = resultat
-            socketio.emit('bearbetning_slutförd', resultat, room=session_id)
+            lägg_till_resultat(session_id, resultat)
+            köa_händelse(session_id, 'bearbetning_slutförd', resultat)
             
             return resultat
             
         except Exception as e:
             logger.error(f"Session {session_id}: Fel vid bearbetning av {fil_sokvag}: {e}")
             
-            # Uppdatera status med fel
-            bearbetnings_status[session_id].update({
-                'status': 'fel',
-                'meddelande': f'Fel: {str(e)}',
-                'progress': 0
-            })
-            socketio.emit('status_update', bearbetnings_status[session_id], room=session_id)
+            # Uppdatera status med fel. Lagringen kan vara orsaken till felet (t.ex. Redis
+            # nere), så ett nytt fel här loggas och filens egen status skickas i stället
+            fel_status = {'status': 'fel', 'progress': 0, 'meddelande': f'Fel: {str(e)}'}
+            try:
+                sessionsstatus = uppdatera_filstatus(session_id, filnamn, **fel_status)
+            except Exception as lagringsfel:
+                logger.error(f"Session {session_id}: Kunde inte spara felstatus: {lagringsfel}")
+                sessionsstatus = dict(fel_status, fil=filnamn)
+            köa_status(session_id, sessionsstatus)
             
             # Skicka felmeddelande till klienten
-            socketio.emit('bearbetning_fel', {
-                'filnamn': fil_sokvag.name,
+            köa_händelse(session_id, 'bearbetning_fel', {
+                'filnamn': filnamn,
                 'fel': str(e)
-            }, room=session_id)
+            })
             
             raise
 
 # Skapa global instans
 web_sorterare = WebRemissSorterare()
 
+# Jobbkö för uppladdade filer och ett fast antal arbetartrådar som delas av alla uppladdningar.
+# OCR sker i processpoolen, så trådarna väntar mest; en per OCR-process räcker.
+# Kön är begränsad så att en störtflod av uppladdningar inte kan växa obegränsat i minnet.
+jobb_kö = queue.Queue(maxsize=WEB_JOBBKÖ_MAX)
+# Bara uppladdningar lägger jobb i kön och arbetarna tar bara ut, så under låset kan en
+# uppladdning kontrollera att alla dess filer får plats och köa dem utan att vänta
+_jobbkö_lås = threading.Lock()
+_arbetare_lås = threading.Lock()
+_arbetare_startade = False
+
+def starta_arbetare():
+    """Startar arbetartrådarna för jobbkön första gången de behövs"""
+    global _arbetare_startade
+    with _arbetare_lås:
+        if not _arbetare_startade:
+            _arbetare_startade = True
+            for _ in range(WEB_OCR_PROCESSER):
+                socketio.start_background_task(_bearbeta_jobb)
+
+def _bearbeta_jobb():
+    """Arbetarloop som bearbetar filer från jobbkön"""
+    while True:
+        session_id, fil_path = jobb_kö.get()
+        try:
+            web_sorterare.bearbeta_fil_web(fil_path, session_id)
+        except Exception:
+            pass  # Felet är redan loggat och skickat till klienten i bearbeta_fil_web
+        finally:
+            jobb_kö.task_done()
+
 @app.route('/')
 def index():
     """Huvudsida"""
@@ -263,11 +976,16 @@ def upload_file():
             return jsonify({'error': 'Inga filer valda'}), 400
         
         files = request.files.getlist('files[]')
+        
+        # Avvisa uppladdningen innan något sparas om jobbkön redan är full
+        if jobb_kö.full():
+            return jsonify({'error': 'Servern är upptagen, försök igen om en stund'}), 503
+        
         session_id = str(uuid.uuid4())
         
         # Skapa session-mapp
         session_mapp = Path(app.config['UPLOAD_FOLDER']) / session_id
-        session_mapp.mkdir(exist_ok=True)
+        os.mkdir(session_mapp)  # Nytt UUID, mappen finns aldrig sedan tidigare
         
         uppladdade_filer = []
         
@@ -278,21 +996,42 @@ def upload_file():
             if file and file.filename.lower().endswith('.pdf'):
                 filename = secure_filename(file.filename)
                 file_path = session_mapp / filename
-                file.save(file_path)
+                if not spara_uppladdning_med_länk(file.stream, file_path):
+                    with open(file_path, 'wb', buffering=UPLOAD_BUFFERT) as ut:
+                        # Reservera utrymmet i förväg när storleken är känd
+                        if file.content_length and hasattr(os, 'posix_fallocate'):
+                            os.posix_fallocate(ut.fileno(), 0, file.content_length)
+                        shutil.copyfileobj(file.stream, ut, UPLOAD_BUFFERT)
+                        ut.truncate()  # Ta bort ev. överskott om angiven storlek var för stor
                 uppladdade_filer.append(file_path)
         
         if not uppladdade_filer:
             return jsonify({'error': 'Inga giltiga PDF-filer hittades'}), 400
         
-        # Starta bearbetning i bakgrund
-        def bearbeta_filer():
-            for fil_path in uppladdade_filer:
-                web_sorterare.bearbeta_fil_web(fil_path, session_id)
-                time.sleep(1)  # Kort paus mellan filer
-        
-        thread = threading.Thread(target=bearbeta_filer)
-        thread.daemon = True
-        thread.start()
+        # Lägg filerna i jobbkön, de delade arbetartrådarna bearbetar dem parallellt.
+        # Ryms inte alla filer avvisas uppladdningen i stället för att vänta på plats.
+        starta_arbetare()
+        köade = 0
+        with _jobbkö_lås:
+            if jobb_kö.maxsize - jobb_kö.qsize() >= len(uppladdade_filer):
+                # Startstatusen sparas innan arbetarna kan börja uppdatera filerna
+                initiera_sessionsstatus(session_id, [f.name for f in uppladdade_filer])
+                try:
+                    for fil_path in uppladdade_filer:
+                        jobb_kö.put_nowait((session_id, fil_path))
+                        köade += 1
+                except queue.Full:
+                    pass
+        
+        if köade < len(uppladdade_filer):
+            # Ta bort filerna som inte köades, och session-mappen om inget jobb köades
+            if köade == 0:
+                shutil.rmtree(session_mapp, ignore_errors=True)
+            else:
+                for fil_path in uppladdade_filer[köade:]:
+                    fil_path.unlink(missing_ok=True)
+            logger.warning(f"Jobbkön full, {len(uppladdade_filer) - köade} filer i session {session_id} avvisades")
+            return jsonify({'error': 'Servern är upptagen, försök igen om en stund'}), 503
         
         return jsonify({
             'session_id': session_id,
@@ -307,30 +1046,105 @@ def upload_file():
 @app.route('/status/<session_id>')
 def get_status(session_id):
     """Hämtar bearbetningsstatus"""
-    return jsonify(bearbetnings_status.get(session_id, {}))
+    # ETag från innehållet; oförändrad status skickas som 304 utan kropp
+    svar = jsonify(bearbetnings_status.get(session_id, {}))
+    svar.add_etag()
+    return svar.make_conditional(request)
 
 @app.route('/resultat/<session_id>')
 def get_resultat(session_id):
     """Hämtar bearbetningsresultat"""
-    return jsonify(bearbetnings_resultat.get(session_id, {}))
+    # Lista med ett resultat per färdig fil; oförändrad lista blir 304
+    svar = jsonify(bearbetnings_resultat.get(session_id, []))
+    svar.add_etag()
+    return svar.make_conditional(request)
+
+# Cache för statistik, giltig så länge ingen mapp i output-trädet ändrats
+_statistik_cache = {'nyckel': None, 'data': {}, 'etag': None}
+_statistik_lås = threading.Lock()
+
+def _räkna_filer(mapp: str) -> Tuple[int, int]:
+    """
+    Räknar PDF- och .dat-filer i en mapp i en scandir-passage
+    
+    Args:
+        mapp: Sökväg till mappen
+        
+    Returns:
+        Tuple med (antal PDF-filer, antal .dat-filer)
+    """
+    antal_pdf = antal_dat = 0
+    with os.scandir(mapp) as filer:
+        for fil in filer:
+            namn = fil.name
+            # is_file() använder d_type från katalogläsningen, inget extra stat-anrop
+            if namn.endswith('.pdf'):
+                antal_pdf += fil.is_file()
+            elif namn.endswith('.dat'):
+                antal_dat += fil.is_file()
+    return antal_pdf, antal_dat
+
+def räkna_statistik(output_mapp: Path) -> Tuple[Dict, str]:
+    """
+    Räknar PDF- och .dat-filer per verksamhetsmapp
+    
+    En mapps mtime ändras när filer läggs till eller tas bort i den, så
+    resultatet återanvänds tills någon av mapparnas mtime ändrats.
+    
+    Args:
+        output_mapp: Mappen med verksamhetsmappar
+        
+    Returns:
+        Tuple med (dictionary med antal filer per verksamhet, ETag för innehållet)
+    """
+    with os.scandir(output_mapp) as poster:
+        mappar = sorted(
+            (post.name, post.path, post.stat().st_mtime_ns)
+            for post in poster if post.is_dir()
+        )
+    nyckel = (os.stat(output_mapp).st_mtime_ns, tuple((namn, mtime) for namn, _, mtime in mappar))
+    
+    with _statistik_lås:
+        if _statistik_cache['nyckel'] == nyckel:
+            return _statistik_cache['data'], _statistik_cache['etag']
+    
+    statistik = {}
+    for namn, sökväg, _ in mappar:
+        antal_pdf, antal_dat = _räkna_filer(sökväg)
+        statistik[namn] = {
+            'pdf_filer': antal_pdf,
+            'dat_filer': antal_dat
+        }
+    
+    etag = hashlib.blake2b(json.dumps(statistik, sort_keys=True).encode('utf-8'), digest_size=16).hexdigest()
+    with _statistik_lås:
+        _statistik_cache.update(nyckel=nyckel, data=statistik, etag=etag)
+    return statistik, etag
+
+def json_svar_med_etag(data: Dict, etag: str):
+    """
+    Skapar ett JSON-svar med ETag, eller 304 om klienten redan har samma version
+    
+    Args:
+        data: Data att skicka
+        etag: ETag för datan
+        
+    Returns:
+        Flask-svar
+    """
+    if request.if_none_match.contains(etag):
+        svar = app.response_class(status=304)
+    else:
+        svar = jsonify(data)
+    svar.set_etag(etag)
+    return svar
 
 @app.route('/statistik')
 def get_statistik():
     """Hämtar statistik över bearbetade filer"""
     try:
-        output_mapp = Path('output')
-        statistik = {}
-        
-        for verksamhet_mapp in output_mapp.iterdir():
-            if verksamhet_mapp.is_dir():
-                pdf_filer = list(verksamhet_mapp.glob('*.pdf'))
-                dat_filer = list(verksamhet_mapp.glob('*.dat'))
-                statistik[verksamhet_mapp.name] = {
-                    'pdf_filer': len(pdf_filer),
-                    'dat_filer': len(dat_filer)
-                }
-        
-        return jsonify(statistik)
+        statistik, etag = räkna_statistik(OUTPUT_ROT)
+        return json_svar_med_etag(statistik, etag)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -338,23 +1152,12 @@ def get_statistik():
 def api_statistik():
     """API för att hämta statistik över bearbetade filer"""
     try:
-        output_mapp = Path('output')
-        statistik = {}
-        
-        if output_mapp.exists():
-            for verksamhet_mapp in output_mapp.iterdir():
-                if verksamhet_mapp.is_dir():
-                    pdf_filer = list(verksamhet_mapp.glob('*.pdf'))
-                    dat_filer = list(verksamhet_mapp.glob('*.dat'))
-                    statistik[verksamhet_mapp.name] = {
-                        'pdf_filer': len(pdf_filer),
-                        'dat_filer': len(dat_filer)
-                    }
+        statistik, etag = räkna_statistik(OUTPUT_ROT) if OUTPUT_ROT.exists() else ({}, 'tom')
         
-        return jsonify({
+        return json_svar_med_etag({
             'success': True,
             'statistik': statistik
-        })
+        }, etag)
     except Exception as e:
         logger.error(f"Fel vid hämtning av statistik: {e}")
         return jsonify({
@@ -366,7 +1169,7 @@ def api_statistik():
 def träna_ml():
     """Tränar ML-modellen"""
     try:
-        accuracy = web_sorterare.ml_identifierare.träna_modell()
+        accuracy = web_sorterare.träna_ml()
         return jsonify({
             'success': True,
             'accuracy': accuracy,
@@ -379,12 +1182,14 @@ def träna_ml():
 def api_osakert_remisser():
     """API för att lista alla remisser i osakert-mappen"""
     try:
-        web_sorterare = WebRemissSorterare()
         osakert_remisser = web_sorterare.sorterare.lista_osakert_remisser()
-        return jsonify({
+        # ETag från innehållet; oförändrad lista skickas som 304 utan kropp
+        svar = jsonify({
             'success': True,
             'remisser': osakert_remisser
         })
+        svar.add_etag()
+        return svar.make_conditional(request)
     except Exception as e:
         logger.error(f"Fel vid hämtning av osakert-remisser: {e}")
         return jsonify({
@@ -406,8 +1211,7 @@ def api_träna_ml_med_omfördelningsdata():
                 'error': 'Ingen omfördelningsdata tillhandahållen'
             }), 400
         
-        web_sorterare = WebRemissSorterare()
-        web_sorterare.sorterare.träna_ml_med_omfördelningsdata(omfördelningsdata)
+        web_sorterare.träna_ml_med_omfördelningsdata(omfördelningsdata)
         
         return jsonify({
             'success': True,
@@ -434,8 +1238,7 @@ def api_analysera_text():
                 'error': 'Ingen text tillhandahållen'
             }), 400
         
-        web_sorterare = WebRemissSorterare()
-        verksamhet, sannolikhet = web_sorterare.sorterare.identifiera_verksamhet(text)
+        verksamhet, sannolikhet = web_sorterare.identifiera_verksamhet(text)
         
         return jsonify({
             'success': True,
@@ -451,6 +1254,77 @@ def api_analysera_text():
             'error': str(e)
         }), 500
 
+@lru_cache(maxsize=32)
+def _gemener(text: str) -> str:
+    """
+    Returnerar texten i gemener, cachad för texter som analyseras flera gånger
+    
+    Debug- och förslagsvyerna skickas ofta samma text om och om igen. Cachen hålls
+    liten eftersom varje post är en hel OCR-text.
+    """
+    return text.lower()
+
+# Specifika termer som ger extra poäng i debug-analysen
+_DEBUG_SPECIFIKA_TERMER = {
+    "Gynekologi": ("livmoder", "äggstockar", "menstruation", "menopaus", "endometrios"),
+    "Kirurgi": ("operation", "operera", "kirurgisk", "snitt", "laparoskopi")
+}
+
+# Sökautomat för debug-analysen; byggs om när verksamheterna i config ändras
+_debug_sökning = {'verksamheter': None, 'nyckelord': (), 'sökord': [], 'automat': None}
+_debug_sökning_lås = threading.Lock()
+
+def _debug_förekomster(text_lower: str) -> Tuple[Dict[str, List[int]], Tuple[Tuple[str, Tuple[Tuple[str, str], ...]], ...]]:
+    """
+    Hittar startpositionerna för alla sökord i debug-analysen
+    
+    Med pyahocorasick görs ett enda svep över texten oavsett antal sökord.
+    
+    Args:
+        text_lower: Text i gemener
+        
+    Returns:
+        Tuple med (dict med sökord -> sorterade startpositioner (även överlappande),
+        tuple av (verksamhet, tuple av (nyckelord, nyckelord i gemener)) i configens ordning)
+    """
+    verksamheter = tuple((verksamhet, tuple(nyckelord)) for verksamhet, nyckelord in VERKSAMHETER.items())
+    
+    with _debug_sökning_lås:
+        if _debug_sökning['verksamheter'] != verksamheter:
+            # Nyckelorden görs om till gemener en gång här i stället för vid varje anrop
+            nyckelord_lc = tuple(
+                (verksamhet, tuple((nyckel, nyckel.lower()) for nyckel in nyckelord))
+                for verksamhet, nyckelord in verksamheter
+            )
+            sökord = {nyckel_lc for _, nyckelord in nyckelord_lc for _, nyckel_lc in nyckelord}
+            sökord.update(MOTTAGARFRASER)
+            sökord.update(klinik for kliniker in MOTTAGARKLINIKER.values() for klinik in kliniker)
+            sökord.update(term for termer in _DEBUG_SPECIFIKA_TERMER.values() for term in termer)
+            sökord.discard('')
+            automat = None
+            if AHOCORASICK_AVAILABLE:
+                automat = ahocorasick.Automaton()
+                for ord_ in sökord:
+                    automat.add_word(ord_, ord_)
+                automat.make_automaton()
+            _debug_sökning.update(verksamheter=verksamheter, nyckelord=nyckelord_lc,
+                                  sökord=sorted(sökord), automat=automat)
+        nyckelord_lc = _debug_sökning['nyckelord']
+        sökord, automat = _debug_sökning['sökord'], _debug_sökning['automat']
+    
+    förekomster: Dict[str, List[int]] = {}
+    if automat is not None:
+        for slut, ord_ in automat.iter(text_lower):
+            förekomster.setdefault(ord_, []).append(slut - len(ord_) + 1)
+        return förekomster, nyckelord_lc
+    
+    for ord_ in sökord:
+        idx = text_lower.find(ord_)
+        while idx != -1:
+            förekomster.setdefault(ord_, []).append(idx)
+            idx = text_lower.find(ord_, idx + 1)
+    return förekomster, nyckelord_lc
+
 @app.route('/api/debug_verksamhetsidentifiering', methods=['POST'])
 def api_debug_verksamhetsidentifiering():
     """API för att debugga verksamhetsidentifieringen steg för steg"""
@@ -464,25 +1338,21 @@ def api_debug_verksamhetsidentifiering():
                 'error': 'Ingen text tillhandahållen'
             }), 400
         
-        text_lower = text.lower()
+        text_lower = _gemener(text)
         debug_info = {
             'text_längd': len(text),
             'text_preview': text[:200] + "..." if len(text) > 200 else text,
             'analys_steg': []
         }
         
-        # Steg 1: Sök efter mottagarfraser
-        mottagarfraser = [
-            "remiss till", "remitteras till", "mottagare:", "mottagande verksamhet:", 
-            "mottagande avdelning:", "remissadress:", "till:", "för:", "till verksamhet:",
-            "till avdelning:", "till klinik:", "till mottagare:", "till specialist:",
-            "remitteras till", "skickas till", "överlämnas till", "överförs till"
-        ]
+        # Alla sökord letas upp i ett enda svep över texten
+        förekomster, nyckelord_lc = _debug_förekomster(text_lower)
         
+        # Steg 1: Sök efter mottagarfraser
         mottagar_match = None
-        for fras in mottagarfraser:
-            idx = text_lower.find(fras)
-            if idx != -1:
+        for fras in MOTTAGARFRASER:
+            if fras in förekomster:
+                idx = förekomster[fras][0]
                 efter = text_lower[idx:idx+200]
                 mottagar_match = {
                     'fras': fras,
@@ -498,28 +1368,14 @@ def api_debug_verksamhetsidentifiering():
         })
         
         # Steg 2: Sök efter specifika mottagarkliniker/avdelningar
-        mottagarkliniker = {
-            "Ortopedi": ["ortopedklinik", "ortopedkliniken", "ortopedavdelning", "ortopedavdelningen"],
-            "Kirurgi": ["kirurgklinik", "kirurgkliniken", "kirurgavdelning", "kirurgavdelningen"],
-            "Kardiologi": ["kardioklinik", "kardiokliniken", "kardioavdelning", "kardioavdelningen"],
-            "Neurologi": ["neurologklinik", "neurologkliniken", "neurologavdelning", "neurologavdelningen"],
-            "Gastroenterologi": ["gastroklinik", "gastrokliniken", "gastroavdelning", "gastroavdelningen"],
-            "Endokrinologi": ["endokrinklinik", "endokrinkliniken", "endokrinavdelning", "endokrinavdelningen"],
-            "Dermatologi": ["dermaklinik", "dermakliniken", "dermaavdelning", "dermaavdelningen"],
-            "Urologi": ["uroklinik", "urokliniken", "uroavdelning", "uroavdelningen"],
-            "Gynekologi": ["gynekoklinik", "gynekokliniken", "gynekoavdelning", "gynekoavdelningen"],
-            "Oftalmologi": ["ögonklinik", "ögonkliniken", "ögonavdelning", "ögonavdelningen"],
-            "Otorinolaryngologi": ["ent-klinik", "ent-kliniken", "ent-avdelning", "ent-avdelningen"]
-        }
-        
         klinik_match = None
-        for verksamhet, kliniker in mottagarkliniker.items():
+        for verksamhet, kliniker in MOTTAGARKLINIKER.items():
             for klinik in kliniker:
-                if klinik in text_lower:
+                if klinik in förekomster:
                     klinik_match = {
                         'verksamhet': verksamhet,
                         'klinik': klinik,
-                        'position': text_lower.find(klinik)
+                        'position': förekomster[klinik][0]
                     }
                     break
             if klinik_match:
@@ -531,19 +1387,31 @@ def api_debug_verksamhetsidentifiering():
             'status': 'hittad' if klinik_match else 'ej hittad'
         })
         
+        # En klinik nära mottagarfrasen avgör verksamheten, så nyckelordsanalys och
+        # poängberäkning hoppas över om inte hela analysen begärs med ?full=1
+        if (klinik_match and mottagar_match and request.args.get('full') != '1'
+                and abs(klinik_match['position'] - mottagar_match['position']) < 100):
+            debug_info['slutresultat'] = {
+                'verksamhet': klinik_match['verksamhet'],
+                'sannolikhet': 100
+            }
+            return jsonify({
+                'success': True,
+                'debug_info': debug_info
+            })
+        
         # Steg 3: Sök efter specifika nyckelord per verksamhet
-        from config import VERKSAMHETER
         nyckelord_analys = {}
         
-        for verksamhet, nyckelord in VERKSAMHETER.items():
+        for verksamhet, nyckelord in nyckelord_lc:
             hittade_nyckelord = []
-            for nyckel in nyckelord:
-                if nyckel.lower() in text_lower:
-                    antal = text_lower.count(nyckel.lower())
+            for nyckel, nyckel_lc in nyckelord:
+                positioner = förekomster.get(nyckel_lc)
+                if positioner:
                     hittade_nyckelord.append({
                         'nyckel': nyckel,
-                        'antal': antal,
-                        'positioner': [i for i in range(len(text_lower)) if text_lower.startswith(nyckel.lower(), i)]
+                        'antal': RemissSorterare._antal_utan_överlapp(positioner, len(nyckel_lc)),
+                        'positioner': positioner
                     })
             
             if hittade_nyckelord:
@@ -556,8 +1424,13 @@ def api_debug_verksamhetsidentifiering():
         })
         
         # Steg 4: Beräkna poäng per verksamhet
+        # Extra poäng för specifika termer ges per hittat nyckelord
+        term_poäng = {
+            verksamhet: 15 * sum(1 for term in termer if term in förekomster)
+            for verksamhet, termer in _DEBUG_SPECIFIKA_TERMER.items()
+        }
         poäng_per_verksamhet = {}
-        for verksamhet, nyckelord in VERKSAMHETER.items():
+        for verksamhet, nyckelord in nyckelord_lc:
             poäng = 0
             total_nyckelord = len(nyckelord)
             
@@ -565,24 +1438,15 @@ def api_debug_verksamhetsidentifiering():
                 for hittad in nyckelord_analys[verksamhet]:
                     poäng += hittad['antal'] * 2
                     
-                    # Extra poäng för kontext
+                    # Extra poäng för kontext; positionerna är sorterade, så antalet
+                    # inom 100 tecken från mottagarfrasen fås med två binärsökningar
                     if mottagar_match:
-                        for pos in hittad['positioner']:
-                            if abs(mottagar_match['position'] - pos) < 100:
-                                poäng += 10
-                    
-                    # Extra poäng för specifika termer
-                    if verksamhet == "Gynekologi":
-                        gynekologiska_termer = ["livmoder", "äggstockar", "menstruation", "menopaus", "endometrios"]
-                        for term in gynekologiska_termer:
-                            if term in text_lower:
-                                poäng += 15
+                        mottagar_pos = mottagar_match['position']
+                        positioner = hittad['positioner']
+                        poäng += 10 * (bisect_left(positioner, mottagar_pos + 100)
+                                       - bisect_right(positioner, mottagar_pos - 100))
                     
-                    if verksamhet == "Kirurgi":
-                        kirurgiska_termer = ["operation", "operera", "kirurgisk", "snitt", "laparoskopi"]
-                        for term in kirurgiska_termer:
-                            if term in text_lower:
-                                poäng += 15
+                    poäng += term_poäng.get(verksamhet, 0)
             
             sannolikhet = min(100, (poäng / total_nyckelord) * 15) if total_nyckelord > 0 else 0
             poäng_per_verksamhet[verksamhet] = {
@@ -620,12 +1484,12 @@ def api_debug_verksamhetsidentifiering():
 def api_ai_status():
     """API för att kontrollera AI-status"""
     try:
-        web_sorterare = WebRemissSorterare()
         ai_status = web_sorterare.sorterare.ai_identifierare.få_användningsstatistik()
         
         return jsonify({
             'success': True,
-            'ai_status': ai_status
+            'ai_status': ai_status,
+            'cache': web_sorterare.cache_info()
         })
     except Exception as e:
         logger.error(f"Fel vid hämtning av AI-status: {e}")
@@ -647,8 +1511,7 @@ def api_testa_ai():
                 'error': 'Ingen text tillhandahållen'
             }), 400
         
-        web_sorterare = WebRemissSorterare()
-        ai_resultat = web_sorterare.sorterare.ai_identifierare.identifiera_verksamhet(text)
+        ai_resultat = web_sorterare.ai_identifiera(text)
         
         return jsonify({
             'success': True,
@@ -665,30 +1528,44 @@ def api_testa_ai():
             'error': str(e)
         }), 500
 
+# Mönster för AI_TYPE, LOKAL_AI_MODEL och OLLAMA_MODEL i ai_config.py
+_AI_CONFIG_MÖNSTER = {
+    namn: re.compile(namn + r'\s*=\s*["\']([^"\']*)["\']')
+    for namn in ('AI_TYPE', 'LOKAL_AI_MODEL', 'OLLAMA_MODEL')
+}
+# Senast lästa värden, nyckel är filens (mtime, storlek)
+_ai_config_cache = {'nyckel': None, 'värden': (None, None, None)}
+_ai_config_lås = threading.Lock()
+
 def läs_ai_config_från_fil():
-    """Läs AI-konfiguration direkt från filen för att få senaste värden"""
+    """
+    Läs AI-konfiguration direkt från filen för att få senaste värden
+    
+    Filen läses bara om när dess ändringstid eller storlek har ändrats.
+    """
     try:
-        import os
         config_file = 'ai_config.py'
-        if not os.path.exists(config_file):
+        try:
+            st = os.stat(config_file)
+        except FileNotFoundError:
             return None, None, None
+        nyckel = (st.st_mtime_ns, st.st_size)
+        
+        with _ai_config_lås:
+            if _ai_config_cache['nyckel'] == nyckel:
+                return _ai_config_cache['värden']
         
         with open(config_file, 'r', encoding='utf-8') as f:
             content = f.read()
         
-        # Extrahera AI_TYPE
-        import re
-        ai_type_match = re.search(r'AI_TYPE\s*=\s*["\']([^"\']*)["\']', content)
-        ai_type = ai_type_match.group(1) if ai_type_match else None
-        
-        # Extrahera LOKAL_AI_MODEL
-        lokal_ai_model_match = re.search(r'LOKAL_AI_MODEL\s*=\s*["\']([^"\']*)["\']', content)
-        lokal_ai_model = lokal_ai_model_match.group(1) if lokal_ai_model_match else None
-        
-        # Extrahera OLLAMA_MODEL
-        ollama_model_match = re.search(r'OLLAMA_MODEL\s*=\s*["\']([^"\']*)["\']', content)
-        ollama_model = ollama_model_match.group(1) if ollama_model_match else None
+        värden = []
+        for mönster in _AI_CONFIG_MÖNSTER.values():
+            match = mönster.search(content)
+            värden.append(match.group(1) if match else None)
+        ai_type, lokal_ai_model, ollama_model = värden
         
+        with _ai_config_lås:
+            _ai_config_cache.update(nyckel=nyckel, värden=(ai_type, lokal_ai_model, ollama_model))
         return ai_type, lokal_ai_model, ollama_model
     except Exception as e:
         logger.error(f"Fel vid läsning av AI-konfiguration: {e}")
@@ -707,7 +1584,6 @@ def api_lokal_ai_status():
                 'error': 'Lokal AI är inte aktiverat i konfigurationen'
             })
         
-        web_sorterare = WebRemissSorterare()
         if hasattr(web_sorterare.sorterare.ai_identifierare, 'få_modell_info'):
             modell_info = web_sorterare.sorterare.ai_identifierare.få_modell_info()
             # Uppdatera modellnamnet med den senaste konfigurationen
@@ -742,7 +1618,6 @@ def api_lokal_ai_modeller():
                 'error': 'Lokal AI är inte aktiverat i konfigurationen'
             })
         
-        web_sorterare = WebRemissSorterare()
         if hasattr(web_sorterare.sorterare.ai_identifierare, 'få_tillgängliga_modeller'):
             modeller = web_sorterare.sorterare.ai_identifierare.få_tillgängliga_modeller()
         else:
@@ -781,9 +1656,10 @@ def api_byt_lokal_ai_modell():
                 'error': 'Lokal AI är inte aktiverat i konfigurationen'
             })
         
-        web_sorterare = WebRemissSorterare()
         if hasattr(web_sorterare.sorterare.ai_identifierare, 'byt_modell'):
-            resultat = web_sorterare.sorterare.ai_identifierare.byt_modell(ny_modell)
+            with web_sorterare.lås:
+                resultat = web_sorterare.sorterare.ai_identifierare.byt_modell(ny_modell)
+                web_sorterare.rensa_identifieringscache()
             
             if resultat:
                 return jsonify({
@@ -813,18 +1689,35 @@ def api_byt_lokal_ai_modell():
         }), 500
 
 
+# Installerade Ollama-modeller ändras sällan, så listan återanvänds en kort stund
+OLLAMA_MODELLER_TTL = 10  # sekunder
+_ollama_modeller_cache = {'tid': 0.0, 'modeller': None}
+_ollama_modeller_lås = threading.Lock()
+
 @app.route('/api/ollama_installerade')
 def api_ollama_installerade():
     """API för att hämta installerade Ollama-modeller"""
     try:
         import requests
+        from lokal_ai_verksamhetsidentifierare import http_session
+        
+        with _ollama_modeller_lås:
+            if (_ollama_modeller_cache['modeller'] is not None
+                    and time.monotonic() - _ollama_modeller_cache['tid'] < OLLAMA_MODELLER_TTL):
+                return jsonify({
+                    'success': True,
+                    'modeller': _ollama_modeller_cache['modeller']
+                })
         
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
+        response = http_session.get("http://localhost:11434/api/tags", timeout=5)
         if response.status_code == 200:
             models = response.json().get("models", [])
+            modeller = [model['name'] for model in models]
+            with _ollama_modeller_lås:
+                _ollama_modeller_cache.update(tid=time.monotonic(), modeller=modeller)
             return jsonify({
                 'success': True,
-                'modeller': [model['name'] for model in models]
+                'modeller': modeller
             })
         else:
             return jsonify({
@@ -857,32 +1750,35 @@ def api_byt_ollama_modell():
                 'error': 'Ingen modell angiven'
             }), 400
         
-        # Uppdatera ai_config.py
-        import os
+        # Uppdatera ai_config.py; står modellen redan där skrivs filen inte om
         config_file = 'ai_config.py'
-        if os.path.exists(config_file):
+        _, _, nuvarande_modell = läs_ai_config_från_fil()
+        if nuvarande_modell != ny_modell and os.path.exists(config_file):
             with open(config_file, 'r', encoding='utf-8') as f:
                 content = f.read()
             
             # Ersätt OLLAMA_MODEL-värdet
-            import re
-            pattern = r'OLLAMA_MODEL\s*=\s*["\'][^"\']*["\']'
             replacement = f'OLLAMA_MODEL = "{ny_modell}"'
-            new_content = re.sub(pattern, replacement, content)
+            new_content = _AI_CONFIG_MÖNSTER['OLLAMA_MODEL'].sub(lambda _: replacement, content, count=1)
             
-            with open(config_file, 'w', encoding='utf-8') as f:
-                f.write(new_content)
+            if new_content != content:
+                with open(config_file, 'w', encoding='utf-8') as f:
+                    f.write(new_content)
         
-        # Ladda om AI-identifieraren med den nya modellen
+        # Byt modell i den befintliga AI-identifieraren i stället för att ladda om allt
         try:
-            # Skapa en ny WebRemissSorterare-instans för att ladda om AI-identifieraren
-            global web_sorterare
-            web_sorterare = WebRemissSorterare()
-            logger.info(f"AI-identifierare laddad om med modell: {ny_modell}")
+            if web_sorterare.byt_ollama_modell(ny_modell):
+                logger.info(f"AI-identifierare använder nu modell: {ny_modell}")
+            else:
+                logger.warning(f"AI-identifieraren kunde inte byta till modell: {ny_modell}")
         except Exception as e:
-            logger.error(f"Fel vid omladdning av AI-identifierare: {e}")
+            logger.error(f"Fel vid byte av modell i AI-identifierare: {e}")
             # Fortsätt ändå eftersom konfigurationen är uppdaterad
         
+        # Hämta modellistan från Ollama igen vid nästa anrop
+        with _ollama_modeller_lås:
+            _ollama_modeller_cache['tid'] = 0.0
+        
         return jsonify({
             'success': True,
             'meddelande': f'Ollama-modell bytt till: {ny_modell}',
@@ -912,8 +1808,14 @@ def api_omfördela_remiss():
             }), 400
         
         # Kontrollera att filen finns
-        nuvarande_mapp = Path('output') / nuvarande_verksamhet
-        ny_mapp = Path('output') / ny_verksamhet
+        pdf_fil = _output_sökväg(nuvarande_verksamhet, filnamn)
+        ny_mapp = _output_sökväg(ny_verksamhet)
+        if pdf_fil is None or ny_mapp is None:
+            return jsonify({
+                'success': False,
+                'error': 'Ogiltig sökväg'
+            }), 400
+        nuvarande_mapp = pdf_fil.parent
         
         if not nuvarande_mapp.exists():
             return jsonify({
@@ -924,8 +1826,7 @@ def api_omfördela_remiss():
         if not ny_mapp.exists():
             ny_mapp.mkdir(parents=True, exist_ok=True)
         
-        pdf_fil = nuvarande_mapp / filnamn
-        dat_fil = nuvarande_mapp / filnamn.replace('.pdf', '.dat')
+        dat_fil = nuvarande_mapp / pdf_fil.name.replace('.pdf', '.dat')
         
         if not pdf_fil.exists():
             return jsonify({
@@ -934,13 +1835,13 @@ def api_omfördela_remiss():
             }), 404
         
         # Flytta PDF-fil
-        ny_pdf_fil = ny_mapp / filnamn
-        import shutil
+        ny_pdf_fil = ny_mapp / pdf_fil.name
+        web_sorterare.glöm_text(pdf_fil, från_disk=False)
         shutil.move(str(pdf_fil), str(ny_pdf_fil))
         
         # Flytta och uppdatera .dat-fil om den finns
         if dat_fil.exists():
-            ny_dat_fil = ny_mapp / filnamn.replace('.pdf', '.dat')
+            ny_dat_fil = ny_mapp / dat_fil.name
             shutil.move(str(dat_fil), str(ny_dat_fil))
             
             # Uppdatera verksamheten i .dat-filen
@@ -964,8 +1865,12 @@ def api_omfördela_remiss():
 def api_remiss_pdf(verksamhet, filnamn):
     """API för att servera PDF-filer direkt"""
     try:
-        verksamhet_mapp = Path('output') / verksamhet
-        pdf_fil = verksamhet_mapp / filnamn
+        pdf_fil = _output_sökväg(verksamhet, filnamn)
+        if pdf_fil is None:
+            return jsonify({
+                'success': False,
+                'error': 'Ogiltig sökväg'
+            }), 400
         
         if not pdf_fil.exists():
             return jsonify({
@@ -992,8 +1897,12 @@ def api_remiss_pdf(verksamhet, filnamn):
 def api_remiss_innehåll(verksamhet, filnamn):
     """API för att hämta innehåll från en remiss"""
     try:
-        verksamhet_mapp = Path('output') / verksamhet
-        pdf_fil = verksamhet_mapp / filnamn
+        pdf_fil = _output_sökväg(verksamhet, filnamn)
+        if pdf_fil is None:
+            return jsonify({
+                'success': False,
+                'error': 'Ogiltig sökväg'
+            }), 400
         
         if not pdf_fil.exists():
             return jsonify({
@@ -1048,13 +1957,13 @@ def api_remiss_innehåll(verksamhet, filnamn):
 @app.route('/download/<path:filename>')
 def download_file(filename):
     """Låter användare ladda ner bearbetade filer"""
-    return send_from_directory('output', filename)
+    # Filen strömmas från disk, och Range/If-None-Match besvaras med 206/304
+    return send_from_directory('output', filename, conditional=True, etag=True)
 
 @app.route('/api/verksamheter', methods=['GET'])
 def api_verksamheter():
     """API för att hämta alla verksamheter"""
     try:
-        from config import VERKSAMHETER
         return jsonify({
             'success': True,
             'verksamheter': VERKSAMHETER
@@ -1070,7 +1979,12 @@ def api_verksamheter():
 def api_remisser_i_verksamhet(verksamhet):
     """API för att hämta remisser från en specifik verksamhet"""
     try:
-        verksamhet_mapp = Path('output') / verksamhet
+        verksamhet_mapp = _output_sökväg(verksamhet)
+        if verksamhet_mapp is None:
+            return jsonify({
+                'success': False,
+                'error': 'Ogiltig sökväg'
+            }), 400
         
         if not verksamhet_mapp.exists():
             return jsonify({
@@ -1086,7 +2000,7 @@ def api_remisser_i_verksamhet(verksamhet):
             dat_fil = pdf_fil.with_suffix('.dat')
             remiss_info = {
                 'filnamn': pdf_fil.name,
-                'sökväg': str(pdf_fil),
+                'sökväg': os.path.join(OUTPUT_MAPP, verksamhet, pdf_fil.name),
                 'storlek': pdf_fil.stat().st_size,
                 'skapad': datetime.fromtimestamp(pdf_fil.stat().st_ctime).strftime('%Y-%m-%d %H:%M:%S'),
                 'modifierad': datetime.fromtimestamp(pdf_fil.stat().st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
@@ -1139,7 +2053,13 @@ def api_radera_remiss():
                 'error': 'Filnamn och verksamhet måste anges'
             }), 400
         
-        verksamhet_mapp = Path('output') / verksamhet
+        pdf_fil = _output_sökväg(verksamhet, filnamn)
+        if pdf_fil is None:
+            return jsonify({
+                'success': False,
+                'error': 'Ogiltig sökväg'
+            }), 400
+        verksamhet_mapp = pdf_fil.parent
         
         if not verksamhet_mapp.exists():
             return jsonify({
@@ -1147,8 +2067,7 @@ def api_radera_remiss():
                 'error': f'Verksamhet {verksamhet} finns inte'
             }), 404
         
-        pdf_fil = verksamhet_mapp / filnamn
-        dat_fil = verksamhet_mapp / filnamn.replace('.pdf', '.dat')
+        dat_fil = verksamhet_mapp / pdf_fil.name.replace('.pdf', '.dat')
         
         if not pdf_fil.exists():
             return jsonify({
@@ -1156,7 +2075,8 @@ def api_radera_remiss():
                 'error': f'Fil {filnamn} finns inte i {verksamhet}'
             }), 404
         
-        # Radera PDF-fil
+        # Radera PDF-fil och dess cachade OCR-text
+        web_sorterare.glöm_text(pdf_fil)
         pdf_fil.unlink()
         
         # Radera .dat-fil om den finns
@@ -1177,6 +2097,37 @@ def api_radera_remiss():
             'error': str(e)
         }), 500
 
+# Omträning av ML-modellen efter ändrade verksamheter görs i bakgrunden. Begäranden som
+# kommer medan en träning pågår slås ihop till en ny träning när den är klar.
+_ml_träning = {'pågår': False, 'igen': False}
+_ml_träning_lås = threading.Lock()
+
+def starta_ml_träning():
+    """Startar omträning av ML-modellen i bakgrunden om ingen redan pågår"""
+    with _ml_träning_lås:
+        if _ml_träning['pågår']:
+            _ml_träning['igen'] = True
+            return
+        _ml_träning['pågår'] = True
+    socketio.start_background_task(_träna_ml_i_bakgrunden)
+
+def _träna_ml_i_bakgrunden():
+    """Bakgrundsuppgift som tränar om ML-modellen och meddelar klienterna"""
+    while True:
+        try:
+            web_sorterare.träna_ml()
+            logger.info("ML-modell tränad om med aktuella verksamheter")
+            socketio.emit('ml_träning_klar', {'success': True})
+        except Exception as e:
+            logger.warning(f"Kunde inte träna om ML-modellen: {e}")
+            socketio.emit('ml_träning_klar', {'success': False, 'error': str(e)})
+        
+        with _ml_träning_lås:
+            if not _ml_träning['igen']:
+                _ml_träning['pågår'] = False
+                return
+            _ml_träning['igen'] = False
+
 @app.route('/api/lägg_till_verksamhet', methods=['POST'])
 def api_lägg_till_verksamhet():
     """API för att lägga till en ny verksamhet"""
@@ -1197,27 +2148,26 @@ def api_lägg_till_verksamhet():
                 'error': 'Minst ett nyckelord krävs'
             }), 400
         
-        # Importera config dynamiskt
-        import config
-        import importlib
+        output_mapp = _output_sökväg(verksamhet_namn)
+        if output_mapp is None:
+            return jsonify({
+                'success': False,
+                'error': 'Ogiltigt verksamhetsnamn'
+            }), 400
         
         # Lägg till verksamheten i config
         if verksamhet_namn not in config.VERKSAMHETER:
             config.VERKSAMHETER[verksamhet_namn] = nyckelord
             
             # Skapa output-mapp för den nya verksamheten
-            output_mapp = Path(f'output/{verksamhet_namn}')
             output_mapp.mkdir(exist_ok=True)
             
-            # Uppdatera ML-identifieraren om den finns
-            try:
-                web_sorterare = WebRemissSorterare()
-                if hasattr(web_sorterare.sorterare, 'ml_identifierare'):
-                    # Träna om ML-modellen med den nya verksamheten
-                    web_sorterare.ml_identifierare.träna_modell()
-                    logger.info(f"ML-modell tränad om med ny verksamhet: {verksamhet_namn}")
-            except Exception as e:
-                logger.warning(f"Kunde inte träna om ML-modellen: {e}")
+            # Sparade identifieringar gjordes utan den nya verksamheten
+            web_sorterare.rensa_identifieringscache()
+            
+            # Träna om ML-modellen med den nya verksamheten i bakgrunden;
+            # klienterna får händelsen ml_träning_klar när den är klar
+            starta_ml_träning()
             
             logger.info(f"Ny verksamhet tillagd: {verksamhet_namn} med {len(nyckelord)} nyckelord")
             
@@ -1228,7 +2178,7 @@ def api_lägg_till_verksamhet():
                     'namn': verksamhet_namn,
                     'nyckelord': nyckelord
                 }
-            })
+            }), 202
         else:
             return jsonify({
                 'success': False,
@@ -1255,23 +2205,23 @@ def api_ta_bort_verksamhet():
                 'error': 'Verksamhetsnamn krävs'
             }), 400
         
-        import config
-        
         if verksamhet_namn in config.VERKSAMHETER:
             # Ta bort från config
             del config.VERKSAMHETER[verksamhet_namn]
             
+            # Sparade identifieringar kan peka på den borttagna verksamheten
+            web_sorterare.rensa_identifieringscache()
+            
             # Flytta alla filer från den verksamheten till "osakert"
-            verksamhet_mapp = Path(f'output/{verksamhet_namn}')
-            osakert_mapp = Path('output/osakert')
+            verksamhet_mapp = _output_sökväg(verksamhet_namn)
             
-            if verksamhet_mapp.exists():
-                for fil in verksamhet_mapp.iterdir():
-                    if fil.is_file():
-                        # Flytta till osakert
-                        ny_sökväg = osakert_mapp / fil.name
-                        fil.rename(ny_sökväg)
-                        logger.info(f"Flyttade {fil.name} till osakert")
+            if verksamhet_mapp is not None and verksamhet_mapp.exists():
+                # Flytta till osakert; is_file() använder d_type från katalogläsningen
+                with os.scandir(verksamhet_mapp) as poster:
+                    filer = [post for post in poster if post.is_file()]
+                for fil in filer:
+                    os.replace(fil.path, OSAKERT_SÖKVÄG / fil.name)
+                logger.info(f"Flyttade {len(filer)} filer från {verksamhet_namn} till osakert")
                 
                 # Ta bort den tomma mappen
                 verksamhet_mapp.rmdir()
@@ -1307,7 +2257,12 @@ def api_verksamhet_fil_antal():
                 'error': 'Verksamhetsnamn krävs'
             }), 400
         
-        verksamhet_mapp = Path(f'output/{verksamhet}')
+        verksamhet_mapp = _output_sökväg(verksamhet)
+        if verksamhet_mapp is None:
+            return jsonify({
+                'success': False,
+                'error': 'Ogiltig sökväg'
+            }), 400
         
         if not verksamhet_mapp.exists():
             return jsonify({
@@ -1315,12 +2270,12 @@ def api_verksamhet_fil_antal():
                 'antal': 0
             })
         
-        # Räkna PDF-filer
-        pdf_filer = list(verksamhet_mapp.glob('*.pdf'))
+        # Räkna PDF-filer i en scandir-passage utan att bygga en lista
+        antal_pdf, _ = _räkna_filer(os.fspath(verksamhet_mapp))
         
         return jsonify({
             'success': True,
-            'antal': len(pdf_filer)
+            'antal': antal_pdf
         })
         
     except Exception as e:
@@ -1344,14 +2299,11 @@ def api_ai_förslag_verksamhet():
                 'error': 'Text krävs för analys'
             }), 400
         
-        from config import VERKSAMHETER
-        
         # Använd lokal AI för att analysera texten
-        web_sorterare = WebRemissSorterare()
         
         if hasattr(web_sorterare.sorterare, 'ai_identifierare') and web_sorterare.sorterare.ai_identifierare:
             # Få AI:s analys
-            verksamhet, sannolikhet = web_sorterare.sorterare.ai_identifierare.identifiera_verksamhet(text)
+            verksamhet, sannolikhet = web_sorterare.ai_identifiera(text)
             
             # Kontrollera om AI föreslår en verksamhet som inte finns
             if verksamhet not in VERKSAMHETER and verksamhet != "Okänd":
@@ -1401,10 +2353,13 @@ def api_ai_förslag_från_pdf():
                 'error': 'PDF-filnamn krävs'
             }), 400
         
-        from config import VERKSAMHETER
-        
         # Hitta PDF-filen i osakert-mappen
-        pdf_sökväg = Path(f'output/osakert/{pdf_namn}')
+        pdf_sökväg = _output_sökväg(OSAKERT_MAPP, pdf_namn)
+        if pdf_sökväg is None:
+            return jsonify({
+                'success': False,
+                'error': 'Ogiltig sökväg'
+            }), 400
         
         if not pdf_sökväg.exists():
             return jsonify({
@@ -1412,20 +2367,10 @@ def api_ai_förslag_från_pdf():
                 'error': f'PDF-fil {pdf_namn} hittades inte'
             }), 404
         
-        # Använd RemissSorterare för att extrahera text från PDF
-        web_sorterare = WebRemissSorterare()
-        
         try:
-            # Konvertera PDF till bilder
-            bilder = web_sorterare.sorterare.pdf_till_bilder(pdf_sökväg)
-            if not bilder:
-                return jsonify({
-                    'success': False,
-                    'error': 'Kunde inte konvertera PDF till bilder'
-                }), 500
-            
-            # Extrahera text med OCR
-            text = web_sorterare.sorterare.extrahera_text_med_ocr(bilder)
+            # Rendering och OCR görs i processpoolen, och texten finns oftast redan i
+            # OCR-cachen eftersom filen lästes när den laddades upp
+            text = web_sorterare.extrahera_text(pdf_sökväg)
             if not text.strip():
                 return jsonify({
                     'success': False,
@@ -1434,7 +2379,7 @@ def api_ai_förslag_från_pdf():
             
             # Använd AI för att analysera texten
             if hasattr(web_sorterare.sorterare, 'ai_identifierare') and web_sorterare.sorterare.ai_identifierare:
-                verksamhet, sannolikhet = web_sorterare.sorterare.ai_identifierare.identifiera_verksamhet(text)
+                verksamhet, sannolikhet = web_sorterare.ai_identifiera(text)
                 
                 # Kontrollera om AI föreslår en verksamhet som inte finns
                 if verksamhet not in VERKSAMHETER and verksamhet != "Okänd":
@@ -1480,62 +2425,84 @@ def api_ai_förslag_från_pdf():
             'error': str(e)
         }), 500
 
+# Termer som slutar med vanliga medicinska suffix
+_MEDICINSKT_SUFFIX_MÖNSTER = re.compile(r'\b\w+(?:ologi|iatri)\b')
+
+# Specifika medicinska områden och termer som indikerar dem
+_FÖRSLAG_OMRÅDEN = {
+    'hud': ['hud', 'dermatologi', 'eksem', 'psoriasis', 'melanom', 'akne'],
+    'ögon': ['öga', 'ögon', 'syn', 'katarakt', 'glaukom', 'oftalmologi'],
+    'öron': ['öra', 'hörsel', 'tinnitus', 'otologi', 'otorinolaryngologi'],
+    'hjärta': ['hjärta', 'kardiologi', 'arytmi', 'infarkt', 'hjärtfel'],
+    'hjärna': ['hjärna', 'neurologi', 'stroke', 'epilepsi', 'parkinson'],
+    'mage': ['mage', 'gastroenterologi', 'ulcus', 'kolit', 'lever'],
+    'lungor': ['lunga', 'pneumologi', 'astma', 'kronisk', 'bronkit'],
+    'ben': ['ben', 'ortopedi', 'fraktur', 'led', 'artros'],
+    'urin': ['urin', 'urologi', 'prostata', 'njure', 'urinblåsa'],
+    'gynekologi': ['livmoder', 'äggstockar', 'menstruation', 'gynekologi']
+}
+
+# Sökautomat för områdestermerna så att texten bara behöver gås igenom en gång
+_FÖRSLAG_AUTOMAT = None
+if AHOCORASICK_AVAILABLE:
+    _FÖRSLAG_AUTOMAT = ahocorasick.Automaton()
+    for _term in {term for termer in _FÖRSLAG_OMRÅDEN.values() for term in termer}:
+        _FÖRSLAG_AUTOMAT.add_word(_term, _term)
+    _FÖRSLAG_AUTOMAT.make_automaton()
+
+def _matchande_områden(text_lower: str) -> List[str]:
+    """
+    Hittar vilka medicinska områden som nämns i texten
+    
+    Args:
+        text_lower: Text i gemener
+        
+    Returns:
+        Lista med matchande områden i samma ordning som _FÖRSLAG_OMRÅDEN
+    """
+    if _FÖRSLAG_AUTOMAT is None:
+        return [område for område, termer in _FÖRSLAG_OMRÅDEN.items()
+                if any(term in text_lower for term in termer)]
+    
+    funna_termer = {term for _, term in _FÖRSLAG_AUTOMAT.iter(text_lower)}
+    return [område for område, termer in _FÖRSLAG_OMRÅDEN.items()
+            if not funna_termer.isdisjoint(termer)]
+
 def skapa_verksamhets_förslag(text: str, föreslagen_verksamhet: str) -> dict:
     """Skapar förslag på ny verksamhet baserat på text och AI-analys"""
     try:
         # Extrahera relevanta termer från texten
-        text_lower = text.lower()
-        
-        # Sök efter medicinska termer som kan indikera verksamhet
-        medicinska_termer = []
-        
-        # Vanliga medicinska suffix
-        suffix_list = ['ologi', 'iatri', 'ologi', 'ologi', 'ologi']
+        text_lower = _gemener(text)
         
         # Sök efter termer som slutar med medicinska suffix
-        import re
-        for suffix in suffix_list:
-            pattern = r'\b\w+' + suffix + r'\b'
-            matches = re.findall(pattern, text_lower)
-            medicinska_termer.extend(matches)
-        
-        # Sök efter specifika medicinska områden
-        områden = {
-            'hud': ['hud', 'dermatologi', 'eksem', 'psoriasis', 'melanom', 'akne'],
-            'ögon': ['öga', 'ögon', 'syn', 'katarakt', 'glaukom', 'oftalmologi'],
-            'öron': ['öra', 'hörsel', 'tinnitus', 'otologi', 'otorinolaryngologi'],
-            'hjärta': ['hjärta', 'kardiologi', 'arytmi', 'infarkt', 'hjärtfel'],
-            'hjärna': ['hjärna', 'neurologi', 'stroke', 'epilepsi', 'parkinson'],
-            'mage': ['mage', 'gastroenterologi', 'ulcus', 'kolit', 'lever'],
-            'lungor': ['lunga', 'pneumologi', 'astma', 'kronisk', 'bronkit'],
-            'ben': ['ben', 'ortopedi', 'fraktur', 'led', 'artros'],
-            'urin': ['urin', 'urologi', 'prostata', 'njure', 'urinblåsa'],
-            'gynekologi': ['livmoder', 'äggstockar', 'menstruation', 'gynekologi']
-        }
+        medicinska_termer = _MEDICINSKT_SUFFIX_MÖNSTER.findall(text_lower)
         
         # Hitta matchande områden
-        matchande_områden = []
-        for område, termer in områden.items():
-            if any(term in text_lower for term in termer):
-                matchande_områden.append(område)
+        matchande_områden = _matchande_områden(text_lower)
         
-        # Skapa förslag på nyckelord
+        # Skapa förslag på nyckelord; mängden används för snabb dubblettkontroll
         föreslagna_nyckelord = []
+        sedda = set()
         
         # Lägg till termer från matchande områden
         for område in matchande_områden:
-            föreslagna_nyckelord.extend(områden[område][:3])  # Ta första 3 termerna
+            for term in _FÖRSLAG_OMRÅDEN[område][:3]:  # Ta första 3 termerna
+                if term not in sedda:
+                    sedda.add(term)
+                    föreslagna_nyckelord.append(term)
         
-        # Lägg till unika termer från texten
-        unika_termer = set()
+        # Lägg till unika termer från texten, max 5 extra termer
+        extra_termer = 0
         for term in medicinska_termer:
-            if term not in föreslagna_nyckelord:
-                unika_termer.add(term)
-        
-        föreslagna_nyckelord.extend(list(unika_termer)[:5])  # Max 5 extra termer
+            if extra_termer == 5:
+                break
+            if term not in sedda:
+                sedda.add(term)
+                föreslagna_nyckelord.append(term)
+                extra_termer += 1
         
-        # Ta bort duplicerade och begränsa längden
-        föreslagna_nyckelord = list(dict.fromkeys(föreslagna_nyckelord))[:8]
+        # Begränsa längden
+        föreslagna_nyckelord = föreslagna_nyckelord[:8]
         
         return {
             'namn': föreslagen_verksamhet,
@@ -1573,9 +2540,11 @@ def handle_join_session(data):
         join_room(session_id)
         logger.info(f"Klient ansluten till session: {session_id}")
         
-        # Skicka befintlig status om den finns
-        if session_id in bearbetnings_status:
-            socketio.emit('status_update', bearbetnings_status[session_id], room=session_id)
+        # Skicka befintlig status om den finns, bara till klienten som anslöt;
+        # övriga klienter i rummet har redan fått den
+        status = bearbetnings_status.get(session_id)
+        if status is not None:
+            emit('status_update', status)
 
 @socketio.on('disconnect')
 def handle_disconnect():
@@ -1595,5 +2564,13 @@ if __name__ == '__main__':
         except Exception as e:
             logger.warning(f"Kunde inte träna ML-modell: {e}")
     
+    # Ladda OCR- och AI-modeller i bakgrunden så att första uppladdningen går snabbt.
+    # OCR-poolens processer startas också nu i stället för vid första uppladdningen.
+    def värm_upp():
+        web_sorterare.sorterare.värm_upp()
+        värm_upp_ocr_pool()
+    
+    threading.Thread(target=värm_upp, daemon=True).start()
+    
     # Starta Flask-app
     socketio.run(app, debug=True, host='0.0.0.0', port=8000)